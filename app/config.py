@@ -22,6 +22,12 @@ class Config:
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
     API_LOG_LEVEL: str = os.getenv("API_LOG_LEVEL", "info")
     
+    # Auto-reload on code changes (development only; single process)
+    API_RELOAD: bool = os.getenv("API_RELOAD", "false").lower() == "true"
+    
+    # Worker processes for `python -m app.main` (ignored when reloading)
+    API_WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    
     # ============ Blockchain (Ethereum Sepolia) ============
     # Smart contract addresses
     DID_REGISTRY_ADDRESS: str = os.getenv("DID_REGISTRY_ADDRESS", "")
@@ -30,6 +36,12 @@ class Config:
     # Alchemy RPC
     ALCHEMY_KEY: str = os.getenv("ALCHEMY_KEY", "")
     
+    # How multi-call reads are sent: "batch" (one JSON-RPC batch) or "gather" (parallel calls)
+    RPC_BATCH_MODE: str = os.getenv("RPC_BATCH_MODE", "batch")
+    
+    # Cache read-only contract calls (CID lookups, DID status) for a short TTL
+    BLOCKCHAIN_READ_CACHE: bool = os.getenv("BLOCKCHAIN_READ_CACHE", "true").lower() == "true"
+    
     # Wallet
     PRIVATE_KEY: str = os.getenv("PRIVATE_KEY", "")
     
@@ -46,6 +58,9 @@ class Config:
     # IPFS Gateway
     IPFS_GATEWAY: str = os.getenv("IPFS_GATEWAY", "https://gateway.pinata.cloud/ipfs")
     
+    # zstd level for binary metadata uploads (0 disables compression)
+    IPFS_COMPRESSION_LEVEL: int = int(os.getenv("IPFS_COMPRESSION_LEVEL", "3"))
+    
     # ============ Encryption ============
     # 32-byte (256-bit) master key as hex string
     MASTER_KEY: str = os.getenv("MASTER_KEY", "")
@@ -59,6 +74,42 @@ class Config:
     # Threshold for successful verification
     VERIFICATION_THRESHOLD: float = float(os.getenv("VERIFICATION_THRESHOLD", "0.75"))
     
+    # ============ ML Inference Settings ============
+    # Run model inference in FP16 (autocast) on CUDA devices; CPU stays FP32
+    ML_HALF_PRECISION: bool = os.getenv("ML_HALF_PRECISION", "true").lower() == "true"
+    
+    # Run EasyOCR on ID documents (disable for face-only document checks)
+    DOC_OCR_ENABLED: bool = os.getenv("DOC_OCR_ENABLED", "true").lower() == "true"
+    
+    # Threads that run document OCR concurrently with face processing; when
+    # all are busy OCR runs on the request thread
+    DOC_OCR_WORKERS: int = int(os.getenv("DOC_OCR_WORKERS", "2"))
+    
+    # Load models and run a synthetic inference in the background at startup
+    ML_WARMUP: bool = os.getenv("ML_WARMUP", "true").lower() == "true"
+    
+    # Decode JPEG selfies on the GPU (nvJPEG via torchvision) and keep face
+    # detection and cropping on the device; CUDA only, OpenCV otherwise
+    FACE_GPU_DECODE: bool = os.getenv("FACE_GPU_DECODE", "false").lower() == "true"
+    
+    # Micro-batching of concurrent embedding requests: how long to wait for
+    # more requests after the first one (0 = only group already-queued ones)
+    # and the largest batch sent to a model
+    ML_BATCH_WINDOW_MS: float = float(os.getenv("ML_BATCH_WINDOW_MS", "0"))
+    ML_BATCH_MAX_SIZE: int = int(os.getenv("ML_BATCH_MAX_SIZE", "16"))
+    
+    # Exported ECAPA-TDNN model (VoiceProcessor.export_onnx); used through
+    # ONNX Runtime instead of the PyTorch model when the file exists
+    VOICE_ONNX_PATH: str = os.getenv("VOICE_ONNX_PATH", "data/speechbrain_models/ecapa.onnx")
+    
+    # INT8 quantized export (VoiceProcessor.quantize_onnx), preferred over
+    # VOICE_ONNX_PATH when ONNX Runtime has no CUDA provider
+    VOICE_ONNX_INT8_PATH: str = os.getenv("VOICE_ONNX_INT8_PATH", "data/speechbrain_models/ecapa_int8.onnx")
+    
+    # Intra-op threads per ONNX Runtime session (0 = half the CPU cores);
+    # keep workers x threads within the machine's core count
+    ORT_INTRA_OP_THREADS: int = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+    
     # ============ File Upload Settings ============
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     
@@ -13,6 +13,9 @@ Data Flow:
 3. History: Query blockchain event logs
 """
 
+import sys
+import threading
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -77,6 +80,9 @@ async def startup_event():
     
     # Check IPFS configuration
     if config.is_ipfs_configured():
+        # Services are built lazily; touch IPFS now so its connection warms up
+        from app.services.ipfs import ipfs_service
+        ipfs_service.is_configured()
         print("✓ IPFS (Pinata): Configured")
     else:
         print("✗ IPFS (Pinata): Not configured - set PINATA_JWT or PINATA_API_KEY/PINATA_SECRET_KEY")
@@ -108,6 +114,12 @@ async def startup_event():
     else:
         print("⚠ Biometric Weights: Do not sum to 1.0")
     
+    # Load ML models in the background so health checks are served meanwhile
+    if config.ML_WARMUP:
+        from app.services.ml_engine import get_ml_engine
+        threading.Thread(target=lambda: get_ml_engine().warmup(), daemon=True).start()
+        print("⏳ ML Models: Warming up in background")
+    
     print("=" * 60)
     print(f"API available at: http://{config.API_HOST}:{config.API_PORT}")
     print(f"Documentation at: http://{config.API_HOST}:{config.API_PORT}/api/docs")
@@ -207,10 +219,15 @@ async def get_config():
 
 
 if __name__ == "__main__":
+    # uvloop/httptools are preferred when installed (uvicorn[standard]);
+    # uvloop is POSIX-only, so Windows falls back to the asyncio loop
     uvicorn.run(
         "app.main:app",
         host=config.API_HOST,
         port=config.API_PORT,
         log_level=config.API_LOG_LEVEL,
-        reload=True
+        loop="asyncio" if sys.platform == "win32" else "auto",
+        http="auto",
+        reload=config.API_RELOAD,
+        workers=None if config.API_RELOAD else config.API_WORKERS
     )
@@ -6,7 +6,7 @@ Data Flow:
 1. Receive biometric files (~4MB total)
 2. Extract embeddings via ML engine
 3. Encrypt embeddings with AES-256-CBC
-4. Bundle into JSON metadata (~5KB)
+4. Bundle into CBOR metadata (~4KB, ciphertext stored as raw bytes)
 5. Upload to IPFS, get CID
 6. Register on blockchain (CID + 32-byte hash)
 """
@@ -17,6 +17,7 @@ import uuid
 import base64
 from typing import Optional, Dict, Any
 from fastapi import APIRouter, File, UploadFile, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from app.config import config
@@ -132,25 +133,18 @@ def calculate_data_reduction(
     raw_doc_size: int,
     encrypted_size: int
 ) -> DataReductionStats:
-    """Calculate data reduction statistics."""
-    total_raw = raw_face_size + raw_voice_size + raw_doc_size
-    hash_size = 32  # SHA-256
-    
-    raw_to_ipfs = total_raw / encrypted_size if encrypted_size > 0 else 0
-    raw_to_hash = total_raw / hash_size
-    saved_percent = (1 - encrypted_size / total_raw) * 100 if total_raw > 0 else 0
-    
-    return DataReductionStats(
-        raw_total_bytes=total_raw,
-        raw_total_kb=round(total_raw / 1024, 2),
-        raw_total_mb=round(total_raw / (1024 * 1024), 2),
-        encrypted_metadata_bytes=encrypted_size,
-        encrypted_metadata_kb=round(encrypted_size / 1024, 2),
-        blockchain_hash_bytes=hash_size,
-        reduction_raw_to_ipfs=f"{raw_to_ipfs:.0f}x",
-        reduction_raw_to_blockchain=f"{raw_to_hash:.0f}x",
-        storage_saved_percent=round(saved_percent, 2)
-    )
+    """
+    Calculate data reduction statistics.
+    
+    Uses the sizes already measured during upload (encrypted_size is the
+    length of the exact bytes pinned), so nothing is re-serialized here.
+    """
+    return DataReductionStats(**ipfs_service.calculate_data_reduction(
+        raw_face_size=raw_face_size,
+        raw_voice_size=raw_voice_size,
+        raw_doc_size=raw_doc_size,
+        encrypted_metadata_size=encrypted_size
+    ))
 
 
 @router.post("/register", response_model=RegistrationResponse)
@@ -165,7 +159,7 @@ async def register_user(
     Process:
     1. Extract biometric embeddings from uploaded files
     2. Encrypt embeddings using AES-256-CBC
-    3. Bundle encrypted data into IPFS metadata JSON
+    3. Bundle encrypted data into IPFS metadata (CBOR)
     4. Upload to IPFS via Pinata
     5. Register on Ethereum Sepolia blockchain
     
@@ -205,8 +199,11 @@ async def register_user(
     
     # ============ Step 1: Process Biometrics ============
     
-    # Process face through ML engine (extracts 512-D ArcFace embedding)
-    face_embedding = ml_engine.process_face(face_bytes)
+    # Process face and document together (one FaceNet pass for both faces):
+    # 512-D face embedding, 640-D combined document embedding + OCR text
+    face_embedding, doc_embedding, doc_text = await run_in_threadpool(
+        ml_engine.process_face_and_document, face_bytes, doc_bytes
+    )
     if face_embedding is None:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -214,15 +211,13 @@ async def register_user(
         )
     
     # Process voice through ML engine (extracts 192-D ECAPA-TDNN embedding)
-    voice_embedding = ml_engine.process_voice(voice_bytes)
+    voice_embedding = await run_in_threadpool(ml_engine.process_voice, voice_bytes)
     if voice_embedding is None:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="Could not process voice sample"
         )
     
-    # Process document through ML engine (extracts 640-D combined embedding + OCR text)
-    doc_embedding, doc_text = ml_engine.process_document(doc_bytes)
     if doc_embedding is None:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -231,19 +226,20 @@ async def register_user(
     
     # ============ Step 2: Encrypt Embeddings ============
     
+    # Ciphertext stays binary; IPFS metadata is CBOR so no Base64 is needed
+    
     # Encrypt face embedding
-    encrypted_face = encryption_service.encrypt_embedding(face_embedding.tobytes())
+    encrypted_face = encryption_service.encrypt_raw(face_embedding.tobytes())
     
     # Encrypt voice embedding
-    encrypted_voice = encryption_service.encrypt_embedding(voice_embedding.tobytes())
+    encrypted_voice = encryption_service.encrypt_raw(voice_embedding.tobytes())
     
     # Encrypt document data (embedding + text as JSON)
     doc_data = {
         "embedding": base64.b64encode(doc_embedding.tobytes()).decode('utf-8'),
         "text": doc_text
     }
-    doc_data_json = json.dumps(doc_data)
-    encrypted_doc = encryption_service.encrypt(doc_data_json.encode('utf-8'))
+    encrypted_doc = encryption_service.encrypt_raw(json.dumps(doc_data).encode('utf-8'))
     
     # ============ Step 3: Generate DID ============
     
@@ -274,9 +270,9 @@ async def register_user(
     ipfs_metadata = create_ipfs_metadata(
         user_id=user_id,
         did=did,
-        encrypted_face=encrypted_face.decode('utf-8'),
-        encrypted_voice=encrypted_voice.decode('utf-8'),
-        encrypted_doc=encrypted_doc.decode('utf-8'),
+        encrypted_face=encrypted_face,
+        encrypted_voice=encrypted_voice,
+        encrypted_doc=encrypted_doc,
         identity_hash=preliminary_hash
     )
     
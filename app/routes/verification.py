@@ -16,6 +16,7 @@ import base64
 import numpy as np
 from typing import Optional, Dict, Any
 from fastapi import APIRouter, File, Form, UploadFile, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from app.config import config
@@ -94,6 +95,18 @@ def bytes_to_embedding(data: bytes, dtype=np.float32) -> np.ndarray:
     return np.frombuffer(data, dtype=dtype)
 
 
+def decrypt_field(value) -> bytes:
+    """
+    Decrypt an encrypted metadata field.
+    
+    CBOR metadata stores raw ciphertext bytes; older JSON metadata stores
+    Base64 strings.
+    """
+    if isinstance(value, str):
+        return encryption_service.decrypt(value.encode('utf-8'))
+    return encryption_service.decrypt_raw(value)
+
+
 def text_similarity(text1: str, text2: str) -> float:
     """
     Compute text similarity using multiple methods.
@@ -102,28 +115,16 @@ def text_similarity(text1: str, text2: str) -> float:
     if not text1 or not text2:
         return 0.0
     
-    # Normalize text
-    text1_normalized = text1.lower().strip()
-    text2_normalized = text2.lower().strip()
-    
-    # Word-level Jaccard similarity
-    words1 = set(text1_normalized.split())
-    words2 = set(text2_normalized.split())
-    
-    if not words1 or not words2:
-        return 0.0
-    
-    intersection = words1.intersection(words2)
-    union = words1.union(words2)
-    jaccard = len(intersection) / len(union) if union else 0.0
+    # Word-level Jaccard similarity (shares the engine's cached tokenizer)
+    jaccard = ml_engine.text_overlap(text1, text2)
     
     # Character n-gram similarity (more robust to OCR errors)
     def get_ngrams(text, n=3):
-        text = text.replace(" ", "")
+        text = text.lower().replace(" ", "")
         return set(text[i:i+n] for i in range(len(text) - n + 1))
     
-    ngrams1 = get_ngrams(text1_normalized)
-    ngrams2 = get_ngrams(text2_normalized)
+    ngrams1 = get_ngrams(text1)
+    ngrams2 = get_ngrams(text2)
     
     if not ngrams1 or not ngrams2:
         return jaccard
@@ -189,7 +190,7 @@ async def fetch_and_decrypt_metadata(did: str) -> Dict[str, Any]:
     
     This is the core decentralized retrieval mechanism:
     1. Query blockchain for CID
-    2. Fetch encrypted JSON from IPFS
+    2. Fetch encrypted metadata (CBOR or legacy JSON) from IPFS
     3. Decrypt embeddings in-memory
     
     Args:
@@ -244,18 +245,15 @@ async def fetch_and_decrypt_metadata(did: str) -> Dict[str, Any]:
     
     try:
         # Decrypt face embedding
-        encrypted_face = ipfs_data['encrypted_face_embedding']
-        decrypted_face_bytes = encryption_service.decrypt(encrypted_face.encode('utf-8'))
+        decrypted_face_bytes = decrypt_field(ipfs_data['encrypted_face_embedding'])
         face_embedding = bytes_to_embedding(decrypted_face_bytes)
         
         # Decrypt voice embedding
-        encrypted_voice = ipfs_data['encrypted_voice_embedding']
-        decrypted_voice_bytes = encryption_service.decrypt(encrypted_voice.encode('utf-8'))
+        decrypted_voice_bytes = decrypt_field(ipfs_data['encrypted_voice_embedding'])
         voice_embedding = bytes_to_embedding(decrypted_voice_bytes)
         
         # Decrypt document data (JSON with embedding + text)
-        encrypted_doc = ipfs_data['encrypted_doc_data']
-        decrypted_doc_bytes = encryption_service.decrypt(encrypted_doc.encode('utf-8'))
+        decrypted_doc_bytes = decrypt_field(ipfs_data['encrypted_doc_data'])
         doc_data = json.loads(decrypted_doc_bytes.decode('utf-8'))
         
         # Decode document embedding from base64
@@ -346,14 +344,14 @@ async def verify_identity(
     
     # ============ Step 2: Process Live Biometrics ============
     
-    live_face_embedding = ml_engine.process_face(face_bytes)
+    live_face_embedding = await run_in_threadpool(ml_engine.process_face, face_bytes)
     if live_face_embedding is None:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="Could not detect face in the live image"
         )
     
-    live_voice_embedding = ml_engine.process_voice(voice_bytes)
+    live_voice_embedding = await run_in_threadpool(ml_engine.process_voice, voice_bytes)
     if live_voice_embedding is None:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -363,11 +361,11 @@ async def verify_identity(
     # ============ Step 3: Compute Similarity Scores ============
     
     # Face similarity (cosine)
-    face_score = ml_engine.cosine_similarity(live_face_embedding, stored_face_embedding)
+    face_score = ml_engine.cosine_similarity_unit(live_face_embedding, stored_face_embedding)
     face_score = max(0.0, min(1.0, face_score))
     
     # Voice similarity (cosine)
-    voice_score = ml_engine.cosine_similarity(live_voice_embedding, stored_voice_embedding)
+    voice_score = ml_engine.cosine_similarity_unit(live_voice_embedding, stored_voice_embedding)
     voice_score = max(0.0, min(1.0, voice_score))
     
     # Document verification
@@ -380,7 +378,9 @@ async def verify_identity(
         doc_bytes = await read_and_validate_file(id_doc)
         
         # Extract text and face from live document
-        live_doc_embedding, live_doc_text = ml_engine.process_document(doc_bytes)
+        live_doc_embedding, live_doc_text = await run_in_threadpool(
+            ml_engine.process_document, doc_bytes
+        )
         
         # Compare extracted text with stored text
         doc_text_score = text_similarity(live_doc_text, stored_doc_text)
@@ -401,13 +401,16 @@ async def verify_identity(
             if live_doc_face_norm > 0.1:  # Only if we have a valid face embedding
                 live_doc_face = live_doc_face / (live_doc_face_norm + 1e-8)
             
-            # Multi-way comparison for better accuracy:
+            # Multi-way comparison for better accuracy (scored in one pass):
             # 1. Live face vs Document face (is this person holding their own ID?)
-            live_vs_doc = ml_engine.cosine_similarity(live_face_embedding, live_doc_face)
-            print(f"Live face vs Document face: {live_vs_doc:.4f}")
-            
             # 2. Stored face vs Document face (does the ID match registration?)
-            stored_vs_doc = ml_engine.cosine_similarity(stored_face_embedding, live_doc_face)
+            live_vs_doc, stored_vs_doc = (
+                float(score) for score in ml_engine.cosine_similarity_batch(
+                    live_doc_face,
+                    np.stack([live_face_embedding, stored_face_embedding])
+                )
+            )
+            print(f"Live face vs Document face: {live_vs_doc:.4f}")
             print(f"Stored face vs Document face: {stored_vs_doc:.4f}")
             
             # Use the MAXIMUM of both comparisons
@@ -3,7 +3,9 @@ DID++ Services Package
 Provides blockchain, encryption, IPFS, and ML services.
 """
 
-from app.services.encryption import encryption_service, compute_sha256, compute_sha256_bytes
+from app.services.encryption import (
+    encryption_service, compute_sha256, compute_sha256_bytes
+)
 from app.services.blockchain import blockchain_service
 from app.services.ipfs import ipfs_service, create_ipfs_metadata
 from app.services.ml_engine import ml_engine
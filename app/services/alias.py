@@ -361,35 +361,20 @@ def is_alias_available(alias: str) -> bool:
 
 # Convenience function for the service layer
 class AliasService:
-    """Service class for alias operations."""
-    
-    @staticmethod
-    def generate_short_code(did: str) -> str:
-        return generate_short_code(did)
-    
-    @staticmethod
-    def register_short_code(did: str) -> str:
-        return register_short_code(did)
-    
-    @staticmethod
-    def register_alias(alias: str, did: str) -> Tuple[bool, Optional[str]]:
-        return register_alias(alias, did)
-    
-    @staticmethod
-    def resolve(identifier: str) -> Optional[str]:
-        return resolve(identifier)
-    
-    @staticmethod
-    def get_identifiers(did: str) -> Dict:
-        return get_identifiers(did)
+    """
+    Service class for alias operations.
     
-    @staticmethod
-    def remove_alias(alias: str, did: str) -> Tuple[bool, Optional[str]]:
-        return remove_alias(alias, did)
+    Methods are bound directly to the module-level functions so each call
+    dispatches straight to the implementation without an extra frame.
+    """
     
-    @staticmethod
-    def is_available(alias: str) -> bool:
-        return is_alias_available(alias)
+    generate_short_code = staticmethod(generate_short_code)
+    register_short_code = staticmethod(register_short_code)
+    register_alias = staticmethod(register_alias)
+    resolve = staticmethod(resolve)
+    get_identifiers = staticmethod(get_identifiers)
+    remove_alias = staticmethod(remove_alias)
+    is_available = staticmethod(is_alias_available)
 
 
 # Global service instance
@@ -9,12 +9,19 @@ Implements:
 """
 
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any, Tuple
+import httpx
+from hexbytes import HexBytes
 from web3 import Web3
+from web3.datastructures import AttributeDict
 from web3.exceptions import ContractLogicError
 from eth_account import Account
 
 from app.config import config
+from app.services.lazy import LazyProxy
 
 
 # ============ DIDRegistry ABI ============
@@ -220,6 +227,57 @@ CONFIDENCE_LEVELS = {
 
 CONFIDENCE_LEVELS_REVERSE = {v: k for k, v in CONFIDENCE_LEVELS.items()}
 
+# Default event log lookback (Sepolia ~12s blocks, 500k blocks ≈ 70 days)
+LOG_LOOKBACK_BLOCKS = 500000
+
+# Upper bound on parallel RPC calls when not batching
+RPC_MAX_CONCURRENCY = 8
+
+# Time-to-live (seconds) for cached read-only calls
+READ_CACHE_TTLS = {
+    "is_connected": 30,
+    "get_metadata_cid": 60,
+    "get_did_record": 60,
+    "is_did_active": 30,
+    "get_verification_count": 15
+}
+
+# Cached reads keyed by DID, dropped when that DID is written to
+DID_READ_METHODS = ("get_metadata_cid", "get_did_record", "is_did_active", "get_verification_count")
+
+# Maximum number of cached read results
+READ_CACHE_MAX_ENTRIES = 4096
+
+
+def _filter_to_rpc(filter_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert web3 filter parameters to their raw JSON-RPC form."""
+    rpc_params = dict(filter_params)
+    
+    if isinstance(rpc_params.get('fromBlock'), int):
+        rpc_params['fromBlock'] = hex(rpc_params['fromBlock'])
+    
+    if 'topics' in rpc_params:
+        rpc_params['topics'] = [
+            Web3.to_hex(topic) if isinstance(topic, (bytes, bytearray)) else topic
+            for topic in rpc_params['topics']
+        ]
+    
+    return rpc_params
+
+
+def _format_rpc_log(raw: Dict[str, Any]) -> AttributeDict:
+    """Convert a raw JSON-RPC log into the shape web3 returns from get_logs."""
+    return AttributeDict({
+        **raw,
+        'blockNumber': int(raw['blockNumber'], 16),
+        'logIndex': int(raw['logIndex'], 16),
+        'transactionIndex': int(raw['transactionIndex'], 16),
+        'transactionHash': HexBytes(raw['transactionHash']),
+        'blockHash': HexBytes(raw['blockHash']),
+        'topics': [HexBytes(topic) for topic in raw['topics']],
+        'data': HexBytes(raw['data'])
+    })
+
 
 class BlockchainService:
     """
@@ -234,6 +292,13 @@ class BlockchainService:
         """Initialize blockchain service with Alchemy connection."""
         self.w3 = Web3(Web3.HTTPProvider(config.ALCHEMY_RPC_URL))
         
+        # Raw HTTP client for JSON-RPC batch requests
+        self._rpc_client = httpx.Client(timeout=30.0)
+        
+        # TTL cache for read-only calls: (method, key) -> (expires_at, value)
+        self._read_cache: Dict[Tuple[str, Any], Tuple[float, Any]] = {}
+        self._read_cache_lock = threading.Lock()
+        
         # Load account from private key
         if config.PRIVATE_KEY:
             self.account = Account.from_key(config.PRIVATE_KEY)
@@ -246,8 +311,11 @@ class BlockchainService:
                 address=Web3.to_checksum_address(config.DID_REGISTRY_ADDRESS),
                 abi=DID_REGISTRY_ABI
             )
+            # Bind the event decoder once instead of rebuilding it per log
+            self._did_registered_event = self.did_registry.events.DIDRegistered()
         else:
             self.did_registry = None
+            self._did_registered_event = None
         
         # Load VerificationLog contract
         if config.VERIFICATION_LOG_ADDRESS:
@@ -255,15 +323,75 @@ class BlockchainService:
                 address=Web3.to_checksum_address(config.VERIFICATION_LOG_ADDRESS),
                 abi=VERIFICATION_LOG_ABI
             )
+            self._verification_logged_event = self.verification_log.events.VerificationLogged()
         else:
             self.verification_log = None
+            self._verification_logged_event = None
+    
+    def _cached_read(
+        self,
+        method: str,
+        key: Any,
+        fetch,
+        force_refresh: bool = False,
+        cache_if=None
+    ):
+        """
+        Return a cached result for a read-only call, fetching it when stale.
+        
+        Args:
+            method: Name of the cached method (selects the TTL)
+            key: Cache key within that method (usually the DID)
+            fetch: Zero-argument callable performing the RPC
+            force_refresh: Bypass the cache and refetch
+            cache_if: Optional predicate; results failing it are not cached
+            
+        Returns:
+            The cached or freshly fetched value
+        """
+        ttl = READ_CACHE_TTLS.get(method, 0) if config.BLOCKCHAIN_READ_CACHE else 0
+        cache_key = (method, key)
+        
+        if ttl > 0 and not force_refresh:
+            with self._read_cache_lock:
+                entry = self._read_cache.get(cache_key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+        
+        value = fetch()
+        
+        if ttl > 0 and (cache_if is None or cache_if(value)):
+            now = time.monotonic()
+            with self._read_cache_lock:
+                if len(self._read_cache) >= READ_CACHE_MAX_ENTRIES:
+                    self._read_cache = {
+                        k: v for k, v in self._read_cache.items() if v[0] > now
+                    }
+                    if len(self._read_cache) >= READ_CACHE_MAX_ENTRIES:
+                        self._read_cache.clear()
+                self._read_cache[cache_key] = (now + ttl, value)
+        
+        return value
+    
+    def invalidate_did(self, did: str) -> None:
+        """Drop cached reads for a DID after it has been written to."""
+        with self._read_cache_lock:
+            for method in DID_READ_METHODS:
+                self._read_cache.pop((method, did), None)
     
-    def is_connected(self) -> bool:
+    def is_connected(self, force_refresh: bool = False) -> bool:
         """Check if connected to blockchain."""
-        try:
-            return self.w3.is_connected()
-        except Exception:
-            return False
+        def fetch():
+            try:
+                return self.w3.is_connected()
+            except Exception:
+                return False
+        
+        return self._cached_read(
+            "is_connected", None, fetch,
+            force_refresh=force_refresh,
+            cache_if=bool
+        )
     
     def is_configured(self) -> bool:
         """Check if blockchain service is properly configured."""
@@ -360,7 +488,9 @@ class BlockchainService:
             identity_hash
         )
         
-        return self._send_transaction(function)
+        result = self._send_transaction(function)
+        self.invalidate_did(did)
+        return result
     
     def update_did(
         self,
@@ -391,18 +521,34 @@ class BlockchainService:
             new_identity_hash
         )
         
-        return self._send_transaction(function)
+        result = self._send_transaction(function)
+        self.invalidate_did(did)
+        return result
     
-    def get_metadata_cid(self, did: str) -> Tuple[Optional[str], Optional[str]]:
+    def get_metadata_cid(
+        self,
+        did: str,
+        force_refresh: bool = False
+    ) -> Tuple[Optional[str], Optional[str]]:
         """
         Get the IPFS CID for a DID's metadata.
         
         Args:
             did: Full DID string
+            force_refresh: Bypass the read cache
             
         Returns:
             Tuple of (cid, error_message)
         """
+        return self._cached_read(
+            "get_metadata_cid", did,
+            lambda: self._fetch_metadata_cid(did),
+            force_refresh=force_refresh,
+            cache_if=lambda result: result[1] is None
+        )
+    
+    def _fetch_metadata_cid(self, did: str) -> Tuple[Optional[str], Optional[str]]:
+        """Query the DIDRegistry contract for a DID's metadata CID."""
         if not self.did_registry:
             return None, "DIDRegistry contract not configured"
         
@@ -414,16 +560,30 @@ class BlockchainService:
         except Exception as e:
             return None, f"Error fetching CID: {str(e)}"
     
-    def get_did_record(self, did: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    def get_did_record(
+        self,
+        did: str,
+        force_refresh: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
         """
         Get the full record for a DID from the blockchain.
         
         Args:
             did: Full DID string
+            force_refresh: Bypass the read cache
             
         Returns:
             Tuple of (record_dict, error_message)
         """
+        return self._cached_read(
+            "get_did_record", did,
+            lambda: self._fetch_did_record(did),
+            force_refresh=force_refresh,
+            cache_if=lambda result: result[1] is None
+        )
+    
+    def _fetch_did_record(self, did: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Query the DIDRegistry contract for a DID's full record."""
         if not self.did_registry:
             return None, "DIDRegistry contract not configured"
         
@@ -444,16 +604,26 @@ class BlockchainService:
         except Exception as e:
             return None, f"Error fetching record: {str(e)}"
     
-    def is_did_active(self, did: str) -> Tuple[bool, bool]:
+    def is_did_active(self, did: str, force_refresh: bool = False) -> Tuple[bool, bool]:
         """
         Check if a DID exists and is active.
         
         Args:
             did: Full DID string
+            force_refresh: Bypass the read cache
             
         Returns:
             Tuple of (exists, active)
         """
+        return self._cached_read(
+            "is_did_active", did,
+            lambda: self._fetch_did_active(did),
+            force_refresh=force_refresh,
+            cache_if=lambda result: result[0]
+        )
+    
+    def _fetch_did_active(self, did: str) -> Tuple[bool, bool]:
+        """Query the DIDRegistry contract for a DID's existence and status."""
         if not self.did_registry:
             return False, False
         
@@ -502,18 +672,30 @@ class BlockchainService:
             success
         )
         
-        return self._send_transaction(function)
+        result = self._send_transaction(function)
+        self.invalidate_did(did)
+        return result
     
-    def get_verification_count(self, did: str) -> int:
+    def get_verification_count(self, did: str, force_refresh: bool = False) -> int:
         """
         Get the number of verifications for a DID.
         
         Args:
             did: Full DID string
+            force_refresh: Bypass the read cache
             
         Returns:
             Verification count
         """
+        return self._cached_read(
+            "get_verification_count", did,
+            lambda: self._fetch_verification_count(did),
+            force_refresh=force_refresh,
+            cache_if=lambda count: count > 0
+        )
+    
+    def _fetch_verification_count(self, did: str) -> int:
+        """Query the VerificationLog contract for a DID's verification count."""
         if not self.verification_log:
             return 0
         
@@ -566,6 +748,84 @@ class BlockchainService:
     
     # ============ Event Log Queries ============
     
+    def _resolve_from_block(self, from_block: int = 0) -> int:
+        """
+        Resolve the starting block for an event log query.
+        
+        Uses a reasonable range (last 500k blocks) when from_block is 0.
+        Sepolia has ~12 second blocks, so 500k blocks ≈ 70 days.
+        """
+        if from_block == 0:
+            current_block = self.w3.eth.block_number
+            from_block = max(0, current_block - LOG_LOOKBACK_BLOCKS)
+        return from_block
+    
+    def _log_filter(self, contract, did: str = None, from_block: int = 0) -> Dict[str, Any]:
+        """
+        Build eth_getLogs filter parameters for a contract.
+        
+        The DID string is not indexed in the events, only didHash is, so the
+        DID filter is applied on the first topic after the event signature.
+        """
+        filter_params = {
+            'fromBlock': from_block,
+            'toBlock': 'latest',
+            'address': contract.address
+        }
+        
+        if did:
+            did_hash = self.w3.keccak(text=did)
+            # Topics: [event_signature, didHash] - didHash is indexed
+            filter_params['topics'] = [None, did_hash]
+        
+        return filter_params
+    
+    def _decode_registration_log(self, log) -> Optional[Dict[str, Any]]:
+        """Decode a DIDRegistered log entry, or None if it is not one."""
+        try:
+            decoded = self._did_registered_event.process_log(log)
+            args = decoded['args']
+            
+            return {
+                "event_type": "registration",
+                "did_hash": args['didHash'].hex(),
+                "did": args['did'],
+                "metadata_cid": args['metadataCID'],
+                "identity_hash": args['identityHash'].hex(),
+                "registrar": args['registrar'],
+                "timestamp": args['timestamp'],
+                "block_number": log['blockNumber'],
+                "tx_hash": log['transactionHash'].hex()
+            }
+        except Exception as decode_error:
+            print(f"Error decoding registration event: {decode_error}")
+            return None
+    
+    def _decode_verification_log(self, log) -> Optional[Dict[str, Any]]:
+        """Decode a VerificationLogged log entry, or None if it is not one."""
+        try:
+            decoded = self._verification_logged_event.process_log(log)
+            args = decoded['args']
+            
+            return {
+                "event_type": "verification",
+                "did_hash": args['didHash'].hex(),
+                "did": args['did'],
+                "verification_hash": args['verificationHash'].hex(),
+                "metadata_cid": args['metadataCID'],
+                "confidence_level": CONFIDENCE_LEVELS_REVERSE.get(
+                    args['confidenceLevel'], "UNKNOWN"
+                ),
+                "success": args['success'],
+                "verifier": args['verifier'],
+                "timestamp": args['timestamp'],
+                "block_number": args['blockNumber'],
+                "tx_hash": log['transactionHash'].hex()
+            }
+        except Exception as decode_error:
+            print(f"Error decoding verification event: {decode_error}")
+            return None
+    
     def get_registration_events(
         self,
         did: str = None,
@@ -588,59 +848,14 @@ class BlockchainService:
             return []
         
         try:
-            # Use eth_getLogs directly instead of create_filter
-            # This is more reliable with Alchemy RPC
-            
-            # Get the current block number
-            current_block = self.w3.eth.block_number
-            
-            # Calculate from_block - use a reasonable range (last 500k blocks or from_block)
-            # Sepolia has ~12 second blocks, so 500k blocks ≈ 70 days
-            if from_block == 0:
-                from_block = max(0, current_block - 500000)
-            
-            # Build filter parameters
-            # For eth_getLogs, topics should be the event signature as first topic
-            # No need to manually filter by DID here - we'll filter after decoding
-            # since the DID string is not indexed in the event, only didHash is
-            
-            filter_params = {
-                'fromBlock': from_block,
-                'toBlock': 'latest',
-                'address': self.did_registry.address
-            }
-            
-            # Add DID filter if provided (didHash is indexed as first topic after signature)
-            if did:
-                did_hash = self.w3.keccak(text=did)
-                # Topics: [event_signature, didHash] - didHash is indexed
-                filter_params['topics'] = [None, did_hash]
+            from_block = self._resolve_from_block(from_block)
+            filter_params = self._log_filter(self.did_registry, did, from_block)
             
             # Get logs using eth_getLogs
             logs = self.w3.eth.get_logs(filter_params)
             
-            result = []
-            for log in logs:
-                try:
-                    # Decode the event
-                    decoded = self.did_registry.events.DIDRegistered().process_log(log)
-                    
-                    result.append({
-                        "event_type": "registration",
-                        "did_hash": decoded['args']['didHash'].hex(),
-                        "did": decoded['args']['did'],
-                        "metadata_cid": decoded['args']['metadataCID'],
-                        "identity_hash": decoded['args']['identityHash'].hex(),
-                        "registrar": decoded['args']['registrar'],
-                        "timestamp": decoded['args']['timestamp'],
-                        "block_number": log['blockNumber'],
-                        "tx_hash": log['transactionHash'].hex()
-                    })
-                except Exception as decode_error:
-                    print(f"Error decoding registration event: {decode_error}")
-                    continue
-            
-            return result
+            decoded = (self._decode_registration_log(log) for log in logs)
+            return [event for event in decoded if event is not None]
             
         except Exception as e:
             print(f"Error getting registration events: {e}")
@@ -670,64 +885,14 @@ class BlockchainService:
             return []
         
         try:
-            # Use eth_getLogs directly instead of create_filter
-            # This is more reliable with Alchemy RPC
-            
-            # Get the current block number
-            current_block = self.w3.eth.block_number
-            
-            # Calculate from_block - use a reasonable range (last 500k blocks or from_block)
-            # Sepolia has ~12 second blocks, so 500k blocks ≈ 70 days
-            if from_block == 0:
-                from_block = max(0, current_block - 500000)
-            
-            # Build filter parameters
-            # For eth_getLogs, topics should be the event signature as first topic
-            # Event: VerificationLogged(bytes32 indexed didHash, string did, bytes32 indexed verificationHash, 
-            #        string metadataCID, uint8 confidenceLevel, bool success, address indexed verifier, 
-            #        uint256 timestamp, uint256 blockNumber)
-            
-            filter_params = {
-                'fromBlock': from_block,
-                'toBlock': 'latest',
-                'address': self.verification_log.address
-            }
-            
-            # Add DID filter if provided (didHash is indexed as first topic after signature)
-            if did:
-                did_hash = self.w3.keccak(text=did)
-                # Topics: [event_signature, didHash] - didHash is indexed
-                filter_params['topics'] = [None, did_hash]
+            from_block = self._resolve_from_block(from_block)
+            filter_params = self._log_filter(self.verification_log, did, from_block)
             
             # Get logs using eth_getLogs
             logs = self.w3.eth.get_logs(filter_params)
             
-            result = []
-            for log in logs:
-                try:
-                    # Decode the event
-                    decoded = self.verification_log.events.VerificationLogged().process_log(log)
-                    
-                    result.append({
-                        "event_type": "verification",
-                        "did_hash": decoded['args']['didHash'].hex(),
-                        "did": decoded['args']['did'],
-                        "verification_hash": decoded['args']['verificationHash'].hex(),
-                        "metadata_cid": decoded['args']['metadataCID'],
-                        "confidence_level": CONFIDENCE_LEVELS_REVERSE.get(
-                            decoded['args']['confidenceLevel'], "UNKNOWN"
-                        ),
-                        "success": decoded['args']['success'],
-                        "verifier": decoded['args']['verifier'],
-                        "timestamp": decoded['args']['timestamp'],
-                        "block_number": decoded['args']['blockNumber'],
-                        "tx_hash": log['transactionHash'].hex()
-                    })
-                except Exception as decode_error:
-                    print(f"Error decoding verification event: {decode_error}")
-                    continue
-            
-            return result
+            decoded = (self._decode_verification_log(log) for log in logs)
+            return [event for event in decoded if event is not None]
             
         except Exception as e:
             print(f"Error getting verification events: {e}")
@@ -735,12 +900,129 @@ class BlockchainService:
             traceback.print_exc()
             return []
     
+    def _get_logs_batch(self, filters: List[Dict[str, Any]]) -> List[Optional[list]]:
+        """
+        Fetch several eth_getLogs filters in a single JSON-RPC batch request.
+        
+        Args:
+            filters: Filter parameters as built by _log_filter
+            
+        Returns:
+            One list of formatted logs per filter (None where that call failed)
+        """
+        payload = [
+            {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": "eth_getLogs",
+                "params": [_filter_to_rpc(filter_params)]
+            }
+            for request_id, filter_params in enumerate(filters)
+        ]
+        
+        response = self._rpc_client.post(config.ALCHEMY_RPC_URL, json=payload)
+        response.raise_for_status()
+        replies = response.json()
+        
+        if not isinstance(replies, list):
+            raise ValueError(f"RPC provider rejected batch request: {replies}")
+        
+        results: List[Optional[list]] = [None] * len(filters)
+        for reply in replies:
+            request_id = reply.get("id")
+            if not isinstance(request_id, int) or not 0 <= request_id < len(filters):
+                continue
+            if "error" in reply:
+                print(f"Error in batched eth_getLogs: {reply['error']}")
+                continue
+            results[request_id] = [_format_rpc_log(raw) for raw in reply.get("result") or []]
+        
+        return results
+    
+    def _get_logs_concurrent(self, filters: List[Dict[str, Any]]) -> List[Optional[list]]:
+        """
+        Fetch several eth_getLogs filters as parallel single requests.
+        
+        Some providers serve a batch no faster than the equivalent individual
+        calls, so this is selectable with RPC_BATCH_MODE=gather.
+        """
+        def fetch(filter_params):
+            try:
+                return self.w3.eth.get_logs(filter_params)
+            except Exception as e:
+                print(f"Error in eth_getLogs: {e}")
+                return None
+        
+        if not filters:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(len(filters), RPC_MAX_CONCURRENCY)) as pool:
+            return list(pool.map(fetch, filters))
+    
+    def get_full_timeline_bulk(self, dids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Get full timelines for several DIDs with as few RPC round trips as possible.
+        
+        All registration and verification log queries are sent together,
+        either as one JSON-RPC batch (RPC_BATCH_MODE=batch, the default) or as
+        parallel single calls (RPC_BATCH_MODE=gather). A batch the provider
+        rejects falls back to parallel calls.
+        
+        Args:
+            dids: Full DID strings
+            
+        Returns:
+            Mapping of DID to its events sorted by timestamp
+        """
+        timelines: Dict[str, List[Dict[str, Any]]] = {did: [] for did in dids}
+        
+        if not dids or not (self.did_registry or self.verification_log):
+            return timelines
+        
+        try:
+            from_block = self._resolve_from_block()
+        except Exception as e:
+            print(f"Error getting block number: {e}")
+            return timelines
+        
+        # One (did, decoder, filter) job per DID and contract
+        jobs = []
+        for did in timelines:
+            if self.did_registry:
+                jobs.append((did, self._decode_registration_log,
+                             self._log_filter(self.did_registry, did, from_block)))
+            if self.verification_log:
+                jobs.append((did, self._decode_verification_log,
+                             self._log_filter(self.verification_log, did, from_block)))
+        
+        filters = [job[2] for job in jobs]
+        
+        if config.RPC_BATCH_MODE == "gather":
+            log_sets = self._get_logs_concurrent(filters)
+        else:
+            try:
+                log_sets = self._get_logs_batch(filters)
+            except Exception as e:
+                print(f"Batched eth_getLogs failed, falling back to parallel calls: {e}")
+                log_sets = self._get_logs_concurrent(filters)
+        
+        for (did, decode, _), logs in zip(jobs, log_sets):
+            for log in logs or []:
+                event = decode(log)
+                if event is not None:
+                    timelines[did].append(event)
+        
+        for timeline in timelines.values():
+            timeline.sort(key=lambda x: (x['timestamp'], x['block_number']))
+        
+        return timelines
+    
     def get_full_timeline(self, did: str) -> List[Dict[str, Any]]:
         """
         Get full timeline of events for a DID.
         
         Combines DIDRegistered and VerificationLogged events into a
-        chronological timeline.
+        chronological timeline. Both log queries share one batched request.
         
         Args:
             did: Full DID string
@@ -748,13 +1030,7 @@ class BlockchainService:
         Returns:
             List of events sorted by timestamp
         """
-        registrations = self.get_registration_events(did)
-        verifications = self.get_verification_events(did)
-        
-        timeline = registrations + verifications
-        timeline.sort(key=lambda x: (x['timestamp'], x['block_number']))
-        
-        return timeline
+        return self.get_full_timeline_bulk([did])[did]
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -794,5 +1070,5 @@ class BlockchainService:
         return stats
 
 
-# Global blockchain service instance
-blockchain_service = BlockchainService()
+# Global blockchain service instance (constructed on first use)
+blockchain_service = LazyProxy(BlockchainService)
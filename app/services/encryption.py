@@ -6,12 +6,43 @@ AES-256-CBC encryption for securing biometric embeddings.
 import os
 import base64
 import hashlib
+import threading
+import weakref
 from typing import Union
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.backends import default_backend
 
 from app.config import config
+from app.services.lazy import LazyProxy
+
+
+# AES block / IV size in bytes
+BLOCK_SIZE = 16
+
+# Random bytes fetched per os.urandom call for IV generation
+IV_POOL_SIZE = 4096
+
+# Services holding an IV pool; their pools are discarded in forked children
+_IV_POOL_OWNERS = weakref.WeakSet()
+
+
+def _reset_iv_pools_after_fork():
+    """
+    Drop every inherited IV pool in a freshly forked child.
+    
+    Without this, workers forked from a parent that already encrypted
+    (gunicorn --preload, multiprocessing) would slice identical IVs from the
+    same leftover bytes. The lock is replaced too, in case another parent
+    thread held it at fork time.
+    """
+    for service in list(_IV_POOL_OWNERS):
+        service._iv_pool = bytearray()
+        service._iv_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):  # POSIX only; Windows never forks
+    os.register_at_fork(after_in_child=_reset_iv_pools_after_fork)
 
 
 class EncryptionService:
@@ -32,6 +63,25 @@ class EncryptionService:
         self.key = bytes.fromhex(key_hex)
         if len(self.key) != 32:
             raise ValueError("Master key must be 32 bytes (256 bits)")
+        
+        # Pool of CSPRNG bytes that IVs are sliced from (reset after fork)
+        self._iv_pool = bytearray()
+        self._iv_lock = threading.Lock()
+        _IV_POOL_OWNERS.add(self)
+    
+    def _next_iv(self) -> bytes:
+        """
+        Return a fresh random 16-byte IV.
+        
+        IVs are sliced from a pool filled by one os.urandom call, so bulk
+        encryption does not pay a system call per IV. Each slice is used once.
+        """
+        with self._iv_lock:
+            if len(self._iv_pool) < BLOCK_SIZE:
+                self._iv_pool = bytearray(os.urandom(IV_POOL_SIZE))
+            iv = bytes(self._iv_pool[:BLOCK_SIZE])
+            del self._iv_pool[:BLOCK_SIZE]
+        return iv
     
     def encrypt(self, data: bytes) -> bytes:
         """
@@ -43,12 +93,24 @@ class EncryptionService:
         Returns:
             Base64-encoded ciphertext (IV + encrypted data)
         """
+        return base64.b64encode(self.encrypt_raw(data))
+    
+    def encrypt_raw(self, data: bytes) -> bytes:
+        """
+        Encrypt data using AES-256-CBC without text encoding.
+        
+        Args:
+            data: Raw bytes to encrypt
+            
+        Returns:
+            Binary ciphertext (IV + encrypted data)
+        """
         # Generate random 16-byte IV
-        iv = os.urandom(16)
+        iv = self._next_iv()
         
-        # Apply PKCS7 padding
-        padder = padding.PKCS7(128).padder()
-        padded_data = padder.update(data) + padder.finalize()
+        # Apply PKCS7 padding (1-16 bytes, each equal to the pad length)
+        pad_len = BLOCK_SIZE - (len(data) & (BLOCK_SIZE - 1))
+        padded_data = data + bytes((pad_len,)) * pad_len
         
         # Create cipher and encrypt
         cipher = Cipher(
@@ -57,11 +119,9 @@ class EncryptionService:
             backend=default_backend()
         )
         encryptor = cipher.encryptor()
-        ciphertext = encryptor.update(padded_data) + encryptor.finalize()
         
-        # Combine IV and ciphertext, then Base64 encode
-        combined = iv + ciphertext
-        return base64.b64encode(combined)
+        # Combine IV and ciphertext in a single allocation
+        return b"".join((iv, encryptor.update(padded_data), encryptor.finalize()))
     
     def decrypt(self, encrypted_data: bytes) -> bytes:
         """
@@ -73,12 +133,23 @@ class EncryptionService:
         Returns:
             Decrypted raw bytes
         """
-        # Base64 decode
-        combined = base64.b64decode(encrypted_data)
+        return self.decrypt_raw(base64.b64decode(encrypted_data))
+    
+    def decrypt_raw(self, combined: bytes) -> bytes:
+        """
+        Decrypt binary AES-256-CBC ciphertext.
         
-        # Extract IV (first 16 bytes) and ciphertext
-        iv = combined[:16]
-        ciphertext = combined[16:]
+        Args:
+            combined: Binary ciphertext (IV + encrypted data)
+            
+        Returns:
+            Decrypted raw bytes
+        """
+        # Extract IV (first 16 bytes) and ciphertext; the ciphertext is a
+        # zero-copy view, which the decryptor accepts directly
+        view = memoryview(combined)
+        iv = bytes(view[:BLOCK_SIZE])
+        ciphertext = view[BLOCK_SIZE:]
         
         # Create cipher and decrypt
         cipher = Cipher(
@@ -104,8 +175,8 @@ class EncryptionService:
         return self.decrypt(encrypted_embedding)
 
 
-# Global encryption service instance
-encryption_service = EncryptionService()
+# Global encryption service instance (constructed on first use)
+encryption_service = LazyProxy(EncryptionService)
 
 
 def compute_sha256(data: Union[bytes, str]) -> str:
@@ -3,19 +3,32 @@ DID++ IPFS Service
 Decentralized storage layer using Pinata for IPFS pinning.
 
 Implements:
-- Encrypted metadata upload to IPFS
+- Encrypted metadata upload to IPFS (CBOR for raw ciphertext, JSON for Base64)
 - CID retrieval and content fetching
 - Automatic garbage collection bypass via pinning
 """
 
+import asyncio
 import json
+import cbor2
 import httpx
-from typing import Optional, Dict, Any, Tuple
-from dataclasses import dataclass
+import zstandard
+from typing import Optional, Dict, Any, Tuple, Union, Iterable
+from dataclasses import dataclass, replace
 import hashlib
+import importlib.util
+import threading
 import time
 
 from app.config import config
+from app.services.lazy import LazyProxy
+
+
+# Frame header that identifies zstd-compressed content
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# HTTP/2 needs the optional h2 package (installed by httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
 
 @dataclass
@@ -35,12 +48,30 @@ class IPFSMetadata:
     version: str
     user_id: str
     did: str
-    encrypted_face_embedding: str  # Base64-encoded encrypted bytes
-    encrypted_voice_embedding: str  # Base64-encoded encrypted bytes
-    encrypted_doc_data: str  # Base64-encoded encrypted JSON (embedding + text)
+    encrypted_face_embedding: Union[str, bytes]  # Encrypted bytes (raw, or Base64 string)
+    encrypted_voice_embedding: Union[str, bytes]  # Encrypted bytes (raw, or Base64 string)
+    encrypted_doc_data: Union[str, bytes]  # Encrypted JSON (embedding + text), raw or Base64
     identity_hash: str  # Hex-encoded SHA-256 hash
     created_at: int  # Unix timestamp
     encryption_metadata: Dict[str, Any]  # IV and algorithm info (no key!)
+    
+    def to_json_bytes(self) -> bytes:
+        """
+        Serialize the metadata to UTF-8 JSON.
+        
+        The instance __dict__ already holds exactly the dataclass fields in
+        declaration order, so it is encoded directly without building a copy.
+        """
+        return json.dumps(vars(self)).encode('utf-8')
+    
+    def to_cbor_bytes(self) -> bytes:
+        """Serialize the metadata to CBOR, keeping ciphertext as raw byte strings."""
+        return cbor2.dumps(vars(self))
+    
+    @property
+    def is_binary(self) -> bool:
+        """Whether the encrypted fields hold raw bytes (requires CBOR)."""
+        return isinstance(self.encrypted_face_embedding, (bytes, bytearray))
 
 
 class IPFSService:
@@ -48,14 +79,16 @@ class IPFSService:
     IPFS service using Pinata for decentralized storage.
     
     Features:
-    - Upload encrypted metadata JSON to IPFS
+    - Upload encrypted metadata (CBOR or JSON) to IPFS
     - Pin content for persistence
     - Retrieve content by CID
     - Gateway URL generation for access
     """
     
     # Pinata API endpoints
+    PINATA_API_URL = "https://api.pinata.cloud"
     PINATA_PIN_JSON_URL = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
+    PINATA_PIN_FILE_URL = "https://api.pinata.cloud/pinning/pinFileToIPFS"
     PINATA_UNPIN_URL = "https://api.pinata.cloud/pinning/unpin"
     PINATA_PIN_LIST_URL = "https://api.pinata.cloud/data/pinList"
     
@@ -84,27 +117,46 @@ class IPFSService:
         # Build headers based on available credentials
         self.headers = self._build_headers()
         
-        # HTTP client with connection pooling
+        # One pooled client shared by all Pinata and gateway calls; over
+        # HTTP/2 requests to the same host multiplex on one connection
         self.client = httpx.Client(
-            timeout=60.0,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=64,
+                max_keepalive_connections=16,
+                keepalive_expiry=120
+            ),
+            timeout=httpx.Timeout(connect=5.0, read=60.0, write=30.0, pool=5.0),
             headers=self.headers
         )
+        
+        # Open the Pinata connection in the background so the first upload
+        # does not pay for the TCP/TLS handshake
+        if self.is_configured():
+            threading.Thread(target=self._warm_connection, daemon=True).start()
+    
+    def _warm_connection(self):
+        """Establish the TCP/TLS/ALPN session to Pinata ahead of first use."""
+        try:
+            self.client.head(self.PINATA_API_URL)
+        except Exception as e:
+            print(f"IPFS connection warm-up failed: {e}")
     
     def _build_headers(self) -> Dict[str, str]:
-        """Build authentication headers for Pinata API."""
+        """
+        Build authentication headers for Pinata API.
+        
+        Content-Type is set per request, since file pins use multipart bodies.
+        """
         if self.jwt:
-            return {
-                "Authorization": f"Bearer {self.jwt}",
-                "Content-Type": "application/json"
-            }
+            return {"Authorization": f"Bearer {self.jwt}"}
         elif self.api_key and self.secret_key:
             return {
                 "pinata_api_key": self.api_key,
-                "pinata_secret_api_key": self.secret_key,
-                "Content-Type": "application/json"
+                "pinata_secret_api_key": self.secret_key
             }
         else:
-            return {"Content-Type": "application/json"}
+            return {}
     
     def is_configured(self) -> bool:
         """Check if IPFS service is properly configured."""
@@ -118,6 +170,11 @@ class IPFSService:
         """
         Upload encrypted biometric metadata to IPFS via Pinata.
         
+        Metadata holding raw ciphertext bytes is pinned as a CBOR file, which
+        avoids the ~33% Base64 inflation, zstd-compressed when
+        IPFS_COMPRESSION_LEVEL > 0. Metadata holding Base64 strings is pinned
+        as JSON.
+        
         Args:
             metadata: IPFSMetadata object containing encrypted data
             pin_name: Optional name for the pin
@@ -135,47 +192,62 @@ class IPFSService:
                 error="IPFS service not configured"
             )
         
-        # Convert metadata to JSON-serializable dict
-        metadata_dict = {
-            "version": metadata.version,
-            "user_id": metadata.user_id,
-            "did": metadata.did,
-            "encrypted_face_embedding": metadata.encrypted_face_embedding,
-            "encrypted_voice_embedding": metadata.encrypted_voice_embedding,
-            "encrypted_doc_data": metadata.encrypted_doc_data,
-            "identity_hash": metadata.identity_hash,
-            "created_at": metadata.created_at,
-            "encryption_metadata": metadata.encryption_metadata
-        }
-        
-        # Calculate size for stats
-        json_str = json.dumps(metadata_dict)
-        size_bytes = len(json_str.encode('utf-8'))
-        
         # Prepare Pinata request
         pin_name = pin_name or f"did-metadata-{metadata.user_id}-{metadata.created_at}"
         
-        payload = {
-            "pinataContent": metadata_dict,
-            "pinataMetadata": {
-                "name": pin_name,
-                "keyvalues": {
-                    "did": metadata.did,
-                    "user_id": metadata.user_id,
-                    "type": "biometric_metadata",
-                    "version": metadata.version
-                }
-            },
-            "pinataOptions": {
-                "cidVersion": 1  # Use CIDv1 for better compatibility
+        pinata_metadata = {
+            "name": pin_name,
+            "keyvalues": {
+                "did": metadata.did,
+                "user_id": metadata.user_id,
+                "type": "biometric_metadata",
+                "version": metadata.version
             }
         }
         
+        # Serialize metadata once; the same bytes give the size and the request body
+        compression_level = config.IPFS_COMPRESSION_LEVEL
+        file_name = f"{pin_name}.cbor"
+        
+        if metadata.is_binary:
+            payload = metadata
+            if compression_level > 0:
+                # Tag a shallow copy; the caller's metadata is left untouched
+                payload = replace(metadata, encryption_metadata={
+                    **metadata.encryption_metadata,
+                    "compression": f"zstd-{compression_level}"
+                })
+            content = payload.to_cbor_bytes()
+            if compression_level > 0:
+                content = zstandard.ZstdCompressor(level=compression_level).compress(content)
+                file_name += ".zst"
+        else:
+            content = metadata.to_json_bytes()
+        size_bytes = len(content)
+        
         try:
-            response = self.client.post(
-                self.PINATA_PIN_JSON_URL,
-                json=payload
-            )
+            if metadata.is_binary:
+                response = self.client.post(
+                    self.PINATA_PIN_FILE_URL,
+                    files={"file": (file_name, content, "application/octet-stream")},
+                    data={
+                        "pinataMetadata": json.dumps(pinata_metadata),
+                        "pinataOptions": json.dumps({"cidVersion": 1})
+                    }
+                )
+            else:
+                # Splice the pre-serialized content into the request body
+                # (cidVersion 1 for better compatibility)
+                body = (
+                    b'{"pinataContent":' + content +
+                    b',"pinataMetadata":' + json.dumps(pinata_metadata).encode('utf-8') +
+                    b',"pinataOptions":{"cidVersion":1}}'
+                )
+                response = self.client.post(
+                    self.PINATA_PIN_JSON_URL,
+                    content=body,
+                    headers={"Content-Type": "application/json"}
+                )
             
             if response.status_code == 200:
                 data = response.json()
@@ -238,18 +310,30 @@ class IPFSService:
             try:
                 response = self.client.get(
                     gateway_url,
-                    headers={"Accept": "application/json"},
                     timeout=30.0
                 )
                 
                 if response.status_code == 200:
-                    return response.json(), None
+                    return self._decode_metadata(response.content), None
                     
             except Exception as e:
                 continue
         
         return None, f"Failed to fetch CID: {cid}"
     
+    @staticmethod
+    def _decode_metadata(content: bytes) -> Dict[str, Any]:
+        """
+        Decode fetched metadata.
+        
+        Handles zstd-compressed CBOR, plain CBOR, and legacy JSON documents.
+        """
+        if content[:4] == ZSTD_MAGIC:
+            content = zstandard.ZstdDecompressor().decompress(content)
+        if content.lstrip()[:1] == b"{":
+            return json.loads(content)
+        return cbor2.loads(content)
+    
     def unpin(self, cid: str) -> bool:
         """
         Unpin content from Pinata (allows garbage collection).
@@ -289,16 +373,121 @@ class IPFSService:
                 self.PINATA_PIN_LIST_URL,
                 params={"hashContains": cid, "status": "pinned"}
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                rows = data.get("rows", [])
-                if rows:
-                    return rows[0]
-            return None
+            return self._parse_pin_status(response)
         except:
             return None
     
+    @staticmethod
+    def _parse_pin_status(response: httpx.Response) -> Optional[Dict[str, Any]]:
+        """Extract the first pinList row from a Pinata response."""
+        if response.status_code == 200:
+            rows = response.json().get("rows", [])
+            if rows:
+                return rows[0]
+        return None
+    
+    def _async_client(self) -> httpx.AsyncClient:
+        """Create an async client with the same auth and pool settings."""
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=64,
+                max_keepalive_connections=16,
+                keepalive_expiry=120
+            ),
+            timeout=httpx.Timeout(connect=5.0, read=60.0, write=30.0, pool=5.0),
+            headers=self.headers
+        )
+    
+    async def unpin_many(
+        self,
+        cids: Iterable[str],
+        concurrency: int = 16
+    ) -> Dict[str, bool]:
+        """
+        Unpin many CIDs concurrently.
+        
+        Pinata has no batch unpin endpoint, so requests are fanned out in
+        parallel, bounded by a semaphore.
+        
+        Args:
+            cids: IPFS Content Identifiers to unpin
+            concurrency: Maximum number of in-flight requests
+            
+        Returns:
+            Dictionary mapping each CID to True if unpinned
+        """
+        cids = [cid for cid in dict.fromkeys(cids) if cid]
+        if not self.is_configured() or not cids:
+            return {cid: False for cid in cids}
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async with self._async_client() as client:
+            async def unpin_one(cid: str) -> bool:
+                async with semaphore:
+                    response = await client.delete(f"{self.PINATA_UNPIN_URL}/{cid}")
+                    return response.status_code == 200
+            
+            results = await asyncio.gather(
+                *(unpin_one(cid) for cid in cids),
+                return_exceptions=True
+            )
+        
+        return {cid: result is True for cid, result in zip(cids, results)}
+    
+    async def pin_status_many(
+        self,
+        cids: Iterable[str],
+        concurrency: int = 16
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Get pinning status for many CIDs concurrently.
+        
+        Args:
+            cids: IPFS Content Identifiers
+            concurrency: Maximum number of in-flight requests
+            
+        Returns:
+            Dictionary mapping each CID to its pin status info or None
+        """
+        cids = [cid for cid in dict.fromkeys(cids) if cid]
+        if not self.is_configured() or not cids:
+            return {cid: None for cid in cids}
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async with self._async_client() as client:
+            async def status_one(cid: str) -> Optional[Dict[str, Any]]:
+                async with semaphore:
+                    response = await client.get(
+                        self.PINATA_PIN_LIST_URL,
+                        params={"hashContains": cid, "status": "pinned"}
+                    )
+                    return self._parse_pin_status(response)
+            
+            results = await asyncio.gather(
+                *(status_one(cid) for cid in cids),
+                return_exceptions=True
+            )
+        
+        return {
+            cid: None if isinstance(result, BaseException) else result
+            for cid, result in zip(cids, results)
+        }
+    
+    def unpin_all(self, cids: Iterable[str], concurrency: int = 16) -> Dict[str, bool]:
+        """Synchronous wrapper for unpin_many (not for use inside an event loop)."""
+        return asyncio.run(self.unpin_many(cids, concurrency))
+    
+    def get_pin_statuses(
+        self,
+        cids: Iterable[str],
+        concurrency: int = 16
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Synchronous wrapper for pin_status_many (not for use inside an event loop)."""
+        return asyncio.run(self.pin_status_many(cids, concurrency))
+    
     def get_gateway_url(self, cid: str, use_public: bool = False) -> str:
         """
         Get gateway URL for a CID.
@@ -327,6 +516,9 @@ class IPFSService:
         Follows the 1600x data reduction pipeline:
         ~4MB raw biometrics → ~5KB encrypted metadata → 32-byte hash
         
+        All sizes are precomputed byte counts; encrypted_metadata_size should
+        be IPFSUploadResult.size_bytes, the length of the pinned payload.
+        
         Args:
             raw_face_size: Size of raw face image in bytes
             raw_voice_size: Size of raw voice audio in bytes
@@ -364,9 +556,9 @@ class IPFSService:
 def create_ipfs_metadata(
     user_id: str,
     did: str,
-    encrypted_face: str,
-    encrypted_voice: str,
-    encrypted_doc: str,
+    encrypted_face: Union[str, bytes],
+    encrypted_voice: Union[str, bytes],
+    encrypted_doc: Union[str, bytes],
     identity_hash: str,
     encryption_algorithm: str = "AES-256-CBC",
     version: str = "1.0.0"
@@ -377,9 +569,9 @@ def create_ipfs_metadata(
     Args:
         user_id: Unique user identifier
         did: Decentralized Identifier
-        encrypted_face: Base64-encoded encrypted face embedding
-        encrypted_voice: Base64-encoded encrypted voice embedding
-        encrypted_doc: Base64-encoded encrypted document data
+        encrypted_face: Encrypted face embedding (raw bytes or Base64 string)
+        encrypted_voice: Encrypted voice embedding (raw bytes or Base64 string)
+        encrypted_doc: Encrypted document data (raw bytes or Base64 string)
         identity_hash: Hex-encoded SHA-256 hash
         encryption_algorithm: Encryption algorithm used
         version: Schema version
@@ -400,11 +592,12 @@ def create_ipfs_metadata(
             "algorithm": encryption_algorithm,
             "key_derivation": "MASTER_KEY",
             "iv_included": True,
-            "padding": "PKCS7"
+            "padding": "PKCS7",
+            "ciphertext_encoding": "raw" if isinstance(encrypted_face, (bytes, bytearray)) else "base64"
         }
     )
 
 
-# Global IPFS service instance
-ipfs_service = IPFSService()
+# Global IPFS service instance (constructed on first use)
+ipfs_service = LazyProxy(IPFSService)
 
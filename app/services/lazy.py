@@ -0,0 +1,52 @@
+"""
+DID++ Lazy Service Proxy
+Defers construction of global service instances until first use.
+"""
+
+import threading
+from typing import Any, Callable
+
+
+class LazyProxy:
+    """
+    Stand-in for a global service instance that is built on first access.
+    
+    Importing a service module stays cheap (no HTTP clients, key parsing or
+    RPC probing); the factory runs once, on the first attribute access, and
+    every later access is forwarded to the real instance.
+    """
+    
+    __slots__ = ("_factory", "_instance", "_lock")
+    
+    def __init__(self, factory: Callable[[], Any]):
+        """
+        Initialize the proxy.
+        
+        Args:
+            factory: Zero-argument callable returning the service instance
+        """
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+    
+    def _get_instance(self) -> Any:
+        """Build the wrapped instance if needed and return it."""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._factory()
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_instance(), name)
+    
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._get_instance(), name, value)
+    
+    def __repr__(self) -> str:
+        if self._instance is None:
+            return f"<LazyProxy for {getattr(self._factory, '__name__', self._factory)!r} (not initialized)>"
+        return repr(self._instance)
@@ -7,33 +7,434 @@ Uses FaceNet (InceptionResnetV1) for face recognition and SpeechBrain ECAPA-TDNN
 import os
 
 os.environ['SPEECHBRAIN_LOCAL_STRATEGY'] = 'copy'
+# Load CUDA kernels on first use instead of all at context creation
+os.environ.setdefault('CUDA_MODULE_LOADING', 'LAZY')
 
+import gc
 import io
+import logging
+import math
+import queue
+import re
+import shutil
+import subprocess
 import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 import numpy as np
-from typing import Tuple, Optional
+from typing import Callable, Tuple, Optional, List, Union
 import cv2
 import librosa
-import easyocr
+import soundfile as sf
+from scipy.signal import savgol_coeffs
 
+try:
+    import numba
+except ImportError:  # optional: compiled char histogram
+    numba = None
 
-class FaceProcessor:
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional: ONNX Runtime speaker encoder
+    ort = None
+
+from app.config import config
+
+# Make sure OpenCV dispatches to its SIMD (SSE4/AVX) kernels for resize/cvtColor
+cv2.setUseOptimized(True)
+
+
+logger = logging.getLogger(__name__)
+
+
+class _ExceptionLogLimiter:
     """
-    Face embedding extraction using FaceNet (via facenet-pytorch).
-    Produces 512-D embeddings that are highly discriminative.
-    Uses MTCNN for face detection and InceptionResnetV1 pretrained on VGGFace2.
+    Log exceptions with tracebacks, at most `limit` per `window` seconds.
+    
+    Under an error storm (e.g. a burst of corrupt uploads) further tracebacks
+    are only counted, and one summary line is logged when the window rolls.
+    Must be called from inside an except block.
     """
     
-    def __init__(self, output_dim: int = 512):
-        self.output_dim = output_dim
+    def __init__(self, limit: int = 10, window: float = 60.0):
+        self.limit = limit
+        self.window = window
+        self._window_start = time.monotonic()
+        self._count = 0
+        self._suppressed = 0
+        self._lock = threading.Lock()
+    
+    def __call__(self, message: str, *args):
+        now = time.monotonic()
+        suppressed = 0
+        with self._lock:
+            if now - self._window_start >= self.window:
+                suppressed = self._suppressed
+                self._window_start = now
+                self._count = 0
+                self._suppressed = 0
+            self._count += 1
+            allowed = self._count <= self.limit
+            if not allowed:
+                self._suppressed += 1
+        
+        if suppressed:
+            logger.warning("%d ML errors suppressed in the last %.0fs", suppressed, self.window)
+        if allowed:
+            logger.exception(message, *args)
+
+
+_log_exception = _ExceptionLogLimiter()
+
+# ffmpeg binary used for audio decoding (None if not installed)
+_FFMPEG_PATH = shutil.which('ffmpeg')
+
+# SpeechBrain speaker model: hub source and persistent download directory
+_SPEECHBRAIN_SOURCE = "speechbrain/spkrec-ecapa-voxceleb"
+_SPEECHBRAIN_SAVEDIR = "data/speechbrain_models/spkrec-ecapa-voxceleb"
+
+# tmpfs mount used to share model files between worker processes
+_SHM_ROOT = "/dev/shm"
+
+
+def get_onnx_providers() -> List[str]:
+    """
+    ONNX Runtime execution providers to use, fastest first.
+    
+    CUDA is used when the installed onnxruntime build supports it; the CPU
+    provider is always last so every session can fall back to it.
+    """
+    if ort is None:
+        return []
+    available = ort.get_available_providers()
+    providers = [p for p in ('CUDAExecutionProvider',) if p in available]
+    providers.append('CPUExecutionProvider')
+    return providers
+
+
+def make_session_options():
+    """
+    ONNX Runtime session options shared by every session this module creates.
+    
+    Each CPU session otherwise starts one intra-op thread per core, so several
+    sessions (and several workers) oversubscribe the machine. The intra-op
+    pool is capped at ORT_INTRA_OP_THREADS (default: half the cores), so the
+    total CPU budget is workers x intra-op threads. All graph optimizations
+    (conv/BN/activation fusion) are enabled.
+    """
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = config.ORT_INTRA_OP_THREADS or max(1, (os.cpu_count() or 2) // 2)
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+@contextmanager
+def _file_lock(path: str):
+    """
+    Hold an exclusive advisory lock on `path` (no-op without fcntl).
+    
+    Serializes model materialization across worker processes, so only the
+    first worker copies files while the others wait and then reuse them.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _dir_size(path: str) -> int:
+    """Total size in bytes of the regular files under `path`."""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def _speechbrain_savedir() -> str:
+    """
+    Directory the SpeechBrain encoder is loaded from.
+    
+    The model is always fetched into the persistent data/ directory. Once it
+    is there and /dev/shm is available with enough free space, it is mirrored
+    to tmpfs, so worker processes read the checkpoint from memory instead of
+    disk. A failed copy is removed so it never occupies shared memory. Call
+    with the savedir lock held; calling again after a fresh download mirrors
+    it for the next workers.
+    
+    Returns:
+        tmpfs model directory, or the persistent one
+    """
+    if not (os.path.isdir(_SHM_ROOT) and os.access(_SHM_ROOT, os.W_OK)):
+        return _SPEECHBRAIN_SAVEDIR
+    
+    shm_dir = os.path.join(_SHM_ROOT, _SPEECHBRAIN_SAVEDIR.replace("data/", "", 1))
+    marker = os.path.join(shm_dir, ".complete")
+    if os.path.exists(marker):
+        return shm_dir
+    
+    # Nothing persisted yet: SpeechBrain fetches into data/ first
+    if not os.path.isfile(os.path.join(_SPEECHBRAIN_SAVEDIR, "embedding_model.ckpt")):
+        return _SPEECHBRAIN_SAVEDIR
+    
+    try:
+        needed = _dir_size(_SPEECHBRAIN_SAVEDIR)
+        free = shutil.disk_usage(_SHM_ROOT).free
+        if free < needed * 1.1:
+            logger.warning(
+                "Not staging SpeechBrain model on tmpfs: %d MB needed, %d MB free",
+                needed >> 20, free >> 20
+            )
+            return _SPEECHBRAIN_SAVEDIR
+        
+        shutil.copytree(_SPEECHBRAIN_SAVEDIR, shm_dir, dirs_exist_ok=True)
+        open(marker, 'w').close()
+        return shm_dir
+    except OSError as e:
+        logger.warning("Could not stage SpeechBrain model on tmpfs: %s", e)
+        shutil.rmtree(shm_dir, ignore_errors=True)
+        return _SPEECHBRAIN_SAVEDIR
+
+
+# Byte -> feature index lookup: a-z / A-Z -> 0..25, 0-9 -> 26..35, anything else -> -1
+_CHAR_LUT = np.full(256, -1, dtype=np.int8)
+_CHAR_LUT[ord('a'):ord('z') + 1] = np.arange(26)
+_CHAR_LUT[ord('A'):ord('Z') + 1] = np.arange(26)
+_CHAR_LUT[ord('0'):ord('9') + 1] = np.arange(26, 36)
+
+
+def _char_hist_numpy(codes: np.ndarray) -> np.ndarray:
+    """36-bin a-z / 0-9 histogram of ASCII bytes (uppercase counts as lowercase)."""
+    idx = _CHAR_LUT[codes]
+    return np.bincount(idx[idx >= 0], minlength=36).astype(np.float32)
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _char_hist(codes):
+        """36-bin a-z / 0-9 histogram of ASCII bytes (uppercase counts as lowercase)."""
+        hist = np.zeros(36, dtype=np.float32)
+        for c in codes:
+            if 65 <= c <= 90:  # A-Z -> a-z
+                c |= 0x20
+            if 97 <= c <= 122:
+                hist[c - 97] += 1
+            elif 48 <= c <= 57:
+                hist[c - 48 + 26] += 1
+        return hist
+else:
+    _char_hist = _char_hist_numpy
+
+# Time-means of librosa.feature.delta (Savitzky-Golay, width 9, mode='interp')
+# for orders 1 and 2, as weights on the MFCC rows. The filter is linear, so its
+# mean over time is: interior taps applied to shifted window sums, plus the
+# edge polynomial fits, which for deriv == polyorder are a constant linear
+# functional of the first/last 9 frames (same weights on both ends).
+_DELTA_WIDTH = 9
+_DELTA_HALF = _DELTA_WIDTH // 2
+_DELTA_OFFSETS = np.arange(-_DELTA_HALF, _DELTA_HALF + 1)
+
+
+def _delta_mean_weights(order: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Interior taps and edge weights whose sums give mean(delta(x, order))."""
+    interior = savgol_coeffs(_DELTA_WIDTH, order, deriv=order, use='dot')
+    vander_pinv = np.linalg.pinv(np.vander(np.arange(_DELTA_WIDTH, dtype=np.float64), order + 1))
+    edge = _DELTA_HALF * float(np.prod(np.arange(1, order + 1))) * vander_pinv[0]
+    return interior, edge
+
+
+_DELTA_WEIGHTS = (_delta_mean_weights(1), _delta_mean_weights(2))
+
+# Word tokens for text overlap: alphanumeric runs (applied to lowercased text)
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+@lru_cache(maxsize=64)
+def _word_set(text: str) -> frozenset:
+    """
+    Tokenize text into a set of lowercase alphanumeric words.
+    
+    Cached: stored document texts are compared against many queries, so
+    they are tokenized once rather than on every comparison. Kept small
+    since the keys are OCR text (personal data) held in memory.
+    """
+    return frozenset(_WORD_RE.findall(text.lower()))
+
+
+def _normalize_f32(x: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize a vector as float32 in a single pass.
+    
+    The squared norm is one BLAS dot product (no temporary), the square root
+    is taken on a Python float, and the scale is applied in place (float32
+    input is not copied).
+    """
+    x = np.asarray(x, dtype=np.float32)
+    if not x.flags.writeable:
+        x = x.copy()
+    x *= 1.0 / (math.sqrt(float(x @ x)) + 1e-8)
+    return x
+
+
+# Image arguments: encoded bytes (any buffer, read without copying) or an
+# already-decoded BGR array
+ImageInput = Union[bytes, bytearray, memoryview, np.ndarray]
+
+
+# cvtColor code to RGB by channel count (2-D arrays are grayscale)
+_TO_RGB = {
+    1: cv2.COLOR_GRAY2RGB,
+    3: cv2.COLOR_BGR2RGB,
+    4: cv2.COLOR_RGBA2RGB,
+}
+
+
+def _to_rgb(image: np.ndarray) -> np.ndarray:
+    """Convert a decoded grayscale / BGR / 4-channel image to RGB."""
+    code = _TO_RGB.get(1 if image.ndim == 2 else image.shape[2])
+    return image if code is None else cv2.cvtColor(image, code)
+
+
+def decode_image(image: ImageInput) -> Optional[np.ndarray]:
+    """
+    Decode encoded image bytes to a BGR array; arrays are passed through.
+    
+    Lets callers decode an upload once and hand the same array to several
+    consumers (OCR, face detection).
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    return cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+
+
+class _MicroBatcher:
+    """
+    Coalesce concurrent single-item inference calls into batched calls.
+    
+    Callers block in submit() while a worker thread drains the queue: it takes
+    the first pending item, keeps collecting for up to `window_ms` (or until
+    `max_batch` items are queued) and runs them through `run_batch` at once.
+    With a window of 0 only requests that are already waiting are grouped, so
+    a lone caller sees no added latency.
+    """
+    
+    def __init__(self, run_batch, max_batch: int, window_ms: float, name: str):
+        """
+        Args:
+            run_batch: Callable taking a list of items and returning one
+                result per item (any indexable sequence)
+            max_batch: Largest number of items passed to run_batch
+            window_ms: How long to wait for more items after the first one
+            name: Worker thread name
+        """
+        self._run_batch = run_batch
+        self._max_batch = max(1, max_batch)
+        self._window = max(0.0, window_ms) / 1000.0
+        self._name = name
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+    
+    def submit(self, item):
+        """Queue one item and block until its result is ready."""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._drain, name=self._name, daemon=True
+                    )
+                    self._worker.start()
+        
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+    
+    def _collect(self) -> list:
+        """Block for the first pending request, then gather a batch."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._window
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _drain(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self._run_batch([item for item, _ in batch])
+            except BaseException as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    # Re-run one by one so only the offending request fails
+                    for item, future in batch:
+                        self._run_one(item, future)
+                continue
+            for i, (_, future) in enumerate(batch):
+                future.set_result(results[i])
+
+    def _run_one(self, item, future: Future):
+        try:
+            future.set_result(self._run_batch([item])[0])
+        except BaseException as e:
+            future.set_exception(e)
+
+
+class _SharedFaceModels:
+    """
+    Process-wide FaceNet models (MTCNN detector + InceptionResnetV1).
+    
+    Every FaceProcessor reads from the single module-level instance, so the
+    weights are loaded into (GPU) memory once no matter how many processors
+    exist.
+    """
+    
+    # (margin, min_face_size, thresholds) of the progressively relaxed MTCNN
+    # detectors tried on ID documents when standard detection fails
+    LENIENT_SETTINGS = (
+        (40, 15, [0.5, 0.6, 0.6]),
+        (60, 10, [0.4, 0.5, 0.5]),
+    )
+    
+    def __init__(self):
         self.mtcnn = None
         self.resnet = None
-        self._initialized = False
-        self._device = None
+        self.device = None
+        self.initialized = False
+        self.lock = threading.Lock()
+        self._lenient = None
     
-    def _get_models(self):
+    def load(self):
         """Lazy initialization of FaceNet models with GPU support."""
-        if not self._initialized:
+        if self.initialized:
+            return
+        with self.lock:
+            if self.initialized:
+                return
             try:
                 import torch
                 from facenet_pytorch import MTCNN, InceptionResnetV1
@@ -47,7 +448,7 @@ class FaceProcessor:
                     print(f"GPU device: {torch.cuda.get_device_name(0)}")
                 
                 # Use GPU if available
-                self._device = torch.device('cuda' if cuda_available else 'cpu')
+                device = torch.device('cuda' if cuda_available else 'cpu')
                 
                 # Initialize MTCNN for face detection
                 
@@ -58,7 +459,7 @@ class FaceProcessor:
                     thresholds=[0.6, 0.7, 0.7],
                     factor=0.709,
                     post_process=True,
-                    device=self._device,
+                    device=device,
                     keep_all=False  
                 )
                 
@@ -66,20 +467,120 @@ class FaceProcessor:
                 self.resnet = InceptionResnetV1(
                     pretrained='vggface2',
                     classify=False,
-                    device=self._device
+                    device=device
                 ).eval()
                 
+                self.resnet = self.resnet.to(device)
                 
-                self.resnet = self.resnet.to(self._device)
+                if cuda_available:
+                    # channels_last keeps the FP16 convs on Tensor Cores
+                    # without per-layer layout transposes
+                    self.resnet = self.resnet.to(memory_format=torch.channels_last)
                 
-                self._initialized = True
-                print(f"FaceNet initialized on device: {self._device}")
+                self.device = device
+                
+                print(f"FaceNet initialized on device: {device}")
             except Exception as e:
-                print(f"Failed to initialize FaceNet: {e}")
-                import traceback
-                traceback.print_exc()
-                self._initialized = True  
-        return self.mtcnn, self.resnet
+                _log_exception("Failed to initialize FaceNet: %s", e)
+            self.initialized = True
+    
+    def lenient_detectors(self) -> list:
+        """
+        Relaxed MTCNN detectors for ID documents, built once on first use.
+        
+        Each MTCNN loads its P/R/O-Net weights on construction, so they are
+        kept rather than rebuilt on every missed document detection.
+        """
+        if self._lenient is None:
+            from facenet_pytorch import MTCNN
+            
+            with self.lock:
+                if self._lenient is None:
+                    self._lenient = [
+                        MTCNN(
+                            image_size=160,
+                            margin=margin,
+                            min_face_size=min_face_size,
+                            thresholds=thresholds,
+                            factor=0.709,
+                            post_process=True,
+                            device=self.device,
+                            keep_all=False
+                        )
+                        for margin, min_face_size, thresholds in self.LENIENT_SETTINGS
+                    ]
+        return self._lenient
+    
+    def unload(self):
+        """Drop the model references and release cached GPU memory."""
+        with self.lock:
+            was_cuda = self.device is not None and self.device.type == 'cuda'
+            self.mtcnn = None
+            self.resnet = None
+            self._lenient = None
+            self.device = None
+            self.initialized = False
+        
+        gc.collect()
+        if was_cuda:
+            import torch
+            torch.cuda.empty_cache()
+        print("FaceNet models unloaded")
+
+
+_FACE_MODELS = _SharedFaceModels()
+
+
+class FaceProcessor:
+    """
+    Face embedding extraction using FaceNet (via facenet-pytorch).
+    Produces 512-D embeddings that are highly discriminative.
+    Uses MTCNN for face detection and InceptionResnetV1 pretrained on VGGFace2.
+    
+    Model weights are shared by all instances (see _SharedFaceModels).
+    """
+    
+    # Longest image side MTCNN detection runs at; larger selfies are downscaled
+    DETECT_MAX_SIDE = 640
+    
+    # Face crops per pinned staging buffer for GPU uploads; larger batches
+    # are uploaded from pageable memory
+    PINNED_BATCH_SIZE = 8
+    
+    def __init__(self, output_dim: int = 512):
+        self.output_dim = output_dim
+        self._pinned = None
+        self._pinned_lock = threading.Lock()
+        # Concurrent process() calls share one FaceNet forward pass
+        self._embed_batcher = _MicroBatcher(
+            self.embed,
+            config.ML_BATCH_MAX_SIZE,
+            config.ML_BATCH_WINDOW_MS,
+            "face-embed-batcher"
+        )
+    
+    @property
+    def mtcnn(self):
+        return _FACE_MODELS.mtcnn
+    
+    @property
+    def resnet(self):
+        return _FACE_MODELS.resnet
+    
+    @property
+    def _device(self):
+        return _FACE_MODELS.device
+    
+    def _get_models(self):
+        """Return the shared (MTCNN, InceptionResnetV1) pair, loading it on first use."""
+        _FACE_MODELS.load()
+        return _FACE_MODELS.mtcnn, _FACE_MODELS.resnet
+    
+    def unload(self):
+        """Release the shared FaceNet models; they are reloaded on next use."""
+        with self._pinned_lock:
+            self._pinned = None
+        _FACE_MODELS.unload()
     
     def preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """
@@ -90,101 +591,333 @@ class FaceProcessor:
         if image is None:
             return None
         
+        image = _to_rgb(image)
         
-        if len(image.shape) == 2:
-            
-            image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-        elif image.shape[2] == 4:
-            
-            image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
-        elif image.shape[2] == 3:
+        # Only ever upscales, where cubic interpolation is the right kernel
+        h, w = image.shape[:2]
+        min_size = 160
+        if h < min_size or w < min_size:
+            scale = max(min_size / h, min_size / w)
+            image = cv2.resize(
+                image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_CUBIC
+            )
+        
+        return image
+    
+    def detect(self, image: ImageInput):
+        """
+        Decode a face image and return the aligned MTCNN face crop.
+        
+        Args:
+            image: Raw image bytes (JPEG) or an already-decoded BGR array
             
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        Returns:
+            3x160x160 face tensor or None if no face was detected
+        """
+        if (
+            config.FACE_GPU_DECODE and
+            isinstance(image, (bytes, bytearray, memoryview)) and
+            bytes(image[:2]) == b'\xff\xd8'
+        ):
+            mtcnn, resnet = self._get_models()
+            if mtcnn is not None and self._device.type == 'cuda':
+                try:
+                    return self._detect_gpu(mtcnn, image)
+                except Exception as e:
+                    _log_exception("GPU JPEG decode failed, using OpenCV: %s", e)
         
+        image = decode_image(image)
+        
+        if image is None:
+            print("Failed to decode image")
+            return None
+        
+        print(f"Original image size: {image.shape}")
+        
+        
+        image = self.preprocess_image(image)
+        
+        if image is None:
+            print("Image preprocessing failed")
+            return None
+        
+        
+        mtcnn, resnet = self._get_models()
+        if mtcnn is None or resnet is None:
+            print("FaceNet models not initialized")
+            return None
+        
+        
+        face_tensor = self._detect_and_extract(mtcnn, image)
+        
+        if face_tensor is None:
+            print(f"No face detected in image (size: {image.shape})")
+            return None
+        
+        return face_tensor
+    
+    def _detect_and_extract(self, mtcnn, image: np.ndarray):
+        """
+        Run MTCNN on a downscaled copy of large images, crop from full resolution.
+        
+        MTCNN's image pyramid cost grows with pixel count, so boxes are found
+        on an image at most DETECT_MAX_SIDE pixels wide, scaled back, and the
+        aligned crop is extracted from the original pixels.
+        """
+        from PIL import Image
         
         h, w = image.shape[:2]
+        scale = self.DETECT_MAX_SIDE / max(h, w)
+        if scale >= 1.0:
+            return mtcnn(Image.fromarray(image))
+        
+        small = cv2.resize(
+            image, (max(1, round(w * scale)), max(1, round(h * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+        boxes, _ = mtcnn.detect(Image.fromarray(small))
+        if boxes is None:
+            return None
+        
+        # Back to full-resolution coordinates, largest face first (keep_all=False)
+        boxes = boxes / scale
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        boxes = boxes[np.argsort(areas)[::-1]]
+        
+        return mtcnn.extract(Image.fromarray(image), boxes, None)
+    
+    def _detect_gpu(self, mtcnn, data: bytes):
+        """
+        Decode a JPEG with nvJPEG and detect/crop the face on the GPU.
         
+        Only the compressed bytes cross PCIe; decoding, the detection
+        downscale, MTCNN and the aligned crop all stay on the device, and the
+        returned crop is a CUDA tensor that embed() uses in place. Crops are
+        resized with area interpolation (facenet-pytorch's tensor path), so
+        embeddings differ very slightly from the OpenCV/PIL path.
         
+        Returns:
+            3x160x160 CUDA face tensor or None if no face was detected
+        """
+        import torch
+        import torch.nn.functional as F
+        from torchvision.io import ImageReadMode, decode_jpeg
+        
+        device = self._device
+        raw = torch.frombuffer(bytearray(data), dtype=torch.uint8)
+        image = decode_jpeg(raw, mode=ImageReadMode.RGB, device=device).float()
+        _, h, w = image.shape
+        
+        # Same minimum size as preprocess_image (cubic upscale)
         min_size = 160
         if h < min_size or w < min_size:
-            scale = max(min_size / h, min_size / w)
-            new_w = int(w * scale)
-            new_h = int(h * scale)
-            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
-            print(f"Resized image from ({w}, {h}) to ({new_w}, {new_h})")
+            up = max(min_size / h, min_size / w)
+            h, w = int(h * up), int(w * up)
+            image = F.interpolate(
+                image[None], size=(h, w), mode='bicubic', align_corners=False
+            )[0].clamp_(0, 255)
         
-        return image
+        scale = min(1.0, self.DETECT_MAX_SIDE / max(h, w))
+        small = image
+        if scale < 1.0:
+            small = F.interpolate(
+                image[None], size=(max(1, round(h * scale)), max(1, round(w * scale))),
+                mode='area'
+            )[0]
+        
+        boxes, _ = mtcnn.detect(small.permute(1, 2, 0))
+        if boxes is None:
+            return None
+        
+        # Largest face (keep_all=False), in full-resolution coordinates
+        boxes = boxes / scale
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        x0, y0, x1, y1 = boxes[int(np.argmax(areas))]
+        
+        # facenet-pytorch extract_face: margin in output pixels, clamped box
+        size, margin = mtcnn.image_size, mtcnn.margin
+        mx = margin * (x1 - x0) / (size - margin)
+        my = margin * (y1 - y0) / (size - margin)
+        x0, y0 = int(max(x0 - mx / 2, 0)), int(max(y0 - my / 2, 0))
+        x1, y1 = int(min(x1 + mx / 2, w)), int(min(y1 + my / 2, h))
+        
+        face = F.interpolate(image[None, :, y0:y1, x0:x1], size=(size, size), mode='area')[0]
+        face = face.to(torch.uint8).float()
+        if mtcnn.post_process:
+            face = (face - 127.5) / 128.0
+        return face
+    
+    def embed(self, face_tensors: List) -> np.ndarray:
+        """
+        Run aligned face crops through FaceNet in a single forward pass.
+        
+        Args:
+            face_tensors: Face tensors from detect() (3x160x160 each)
+            
+        Returns:
+            (N, 512) float32 array of L2-normalized embeddings
+        """
+        import torch
+        
+        _, resnet = self._get_models()
+        device = self._device
+        
+        crops = [t.squeeze(0) if t.dim() == 4 else t for t in face_tensors]
+        n = len(crops)
+        
+        # cudnn.benchmark (enabled on CUDA) autotunes once per input shape, so
+        # batches are padded to a few fixed sizes rather than every size the
+        # micro-batcher produces; padded rows are dropped from the output
+        # (eval-mode BatchNorm keeps rows independent)
+        padded = self._padded_batch_size(n) if device.type == 'cuda' else n
+        
+        if (
+            device.type != 'cuda' or
+            padded > self.PINNED_BATCH_SIZE or
+            any(t.is_cuda for t in crops)
+        ):
+            # Crops may mix host and device tensors (GPU-decoded selfies)
+            batch = torch.stack([t.to(device) for t in crops])
+            if padded > n:
+                batch = torch.cat([batch, batch.new_zeros((padded - n,) + tuple(batch.shape[1:]))])
+            embeddings = self._run_resnet(resnet, batch, device)[:n]
+        else:
+            # Stack straight into a reusable pinned buffer so the upload is an
+            # async DMA; the lock is held until results are back on the host.
+            # Rows past n (zeros or earlier crops) only fill the padding.
+            with self._pinned_lock:
+                if self._pinned is None:
+                    self._pinned = torch.zeros(
+                        (self.PINNED_BATCH_SIZE, 3, 160, 160),
+                        dtype=torch.float32,
+                        pin_memory=True
+                    )
+                torch.stack(crops, out=self._pinned[:n])
+                embeddings = self._run_resnet(
+                    resnet, self._pinned[:padded].to(device, non_blocking=True), device
+                )[:n]
+        
+        norms = np.sqrt(np.einsum('ij,ij->i', embeddings, embeddings))
+        embeddings /= (norms + 1e-8)[:, None]
+        return embeddings
+    
+    @staticmethod
+    def _padded_batch_size(n: int) -> int:
+        """Round a batch size up to a power of two (a multiple of 32 past 32)."""
+        if n > 32:
+            return -(-n // 32) * 32
+        return 1 << (n - 1).bit_length()
+    
+    @staticmethod
+    def _run_resnet(resnet, batch, device) -> np.ndarray:
+        """FaceNet forward pass returning raw (N, 512) float32 embeddings."""
+        import torch
+        
+        # FP16 on CUDA runs the conv stack on Tensor Cores; output is cast back to FP32
+        use_fp16 = config.ML_HALF_PRECISION and device.type == 'cuda'
+        
+        if device.type == 'cuda':
+            # Match the channels_last weights set up in _SharedFaceModels.load
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        
+        # cuDNN autotuning is scoped to this forward: FaceNet only sees
+        # 3x160x160 crops in the few batch sizes embed() pads to, whereas
+        # MTCNN, ECAPA and EasyOCR inputs change shape on every request
+        cudnn = torch.backends.cudnn
+        with torch.inference_mode(), cudnn.flags(
+            enabled=True,
+            benchmark=device.type == 'cuda',
+            deterministic=cudnn.deterministic,
+            allow_tf32=cudnn.allow_tf32
+        ), torch.autocast(
+            device_type=device.type, dtype=torch.float16, enabled=use_fp16
+        ):
+            return resnet(batch).float().cpu().numpy()
     
-    def process(self, image_bytes: bytes) -> Optional[np.ndarray]:
+    def process(self, image: ImageInput) -> Optional[np.ndarray]:
         """
         Process face image and return 512-D FaceNet embedding.
         
         Args:
-            image_bytes: Raw image bytes (JPEG)
+            image: Raw image bytes (JPEG) or an already-decoded BGR array
             
         Returns:
             512-D float32 embedding or None if face not detected
         """
         try:
-            import torch
-            from PIL import Image
-            
-            
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if image is None:
-                print("Failed to decode image")
-                return None
-            
-            print(f"Original image size: {image.shape}")
-            
-            
-            image = self.preprocess_image(image)
-            
-            if image is None:
-                print("Image preprocessing failed")
-                return None
-            
-            
-            mtcnn, resnet = self._get_models()
-            if mtcnn is None or resnet is None:
-                print("FaceNet models not initialized")
-                return None
-            
-            
-            pil_image = Image.fromarray(image)
-            
-            
-            face_tensor = mtcnn(pil_image)
-            
+            face_tensor = self.detect(image)
             if face_tensor is None:
-                print(f"No face detected in image (size: {image.shape})")
                 return None
             
+            embedding = self._embed_batcher.submit(face_tensor)
+            print(f"Face detected! Embedding shape: {embedding.shape}")
             
-            if face_tensor.dim() == 3:
-                face_tensor = face_tensor.unsqueeze(0)
-            face_tensor = face_tensor.to(self._device)
-            
+            return embedding
             
-            with torch.no_grad():
-                embedding = resnet(face_tensor)
-                embedding = embedding.squeeze().cpu().numpy()
+        except Exception as e:
+            _log_exception("Face processing error: %s", e)
+            return None
+    
+    def process_from_path(self, path: str) -> Optional[np.ndarray]:
+        """
+        Process a face image file and return its 512-D FaceNet embedding.
+        
+        High-resolution files (at least twice DETECT_MAX_SIDE on the long
+        edge) are decoded by libjpeg at half resolution, which is still well
+        above what detection and the 160x160 crop need.
+        
+        Args:
+            path: Path to the image file
             
-            print(f"Face detected! Embedding shape: {embedding.shape}")
+        Returns:
+            512-D float32 embedding or None if face not detected
+        """
+        from PIL import Image
+        
+        flags = cv2.IMREAD_COLOR
+        try:
+            # Only the header is read here
+            with Image.open(path) as header:
+                if max(header.size) >= 2 * self.DETECT_MAX_SIDE:
+                    flags = cv2.IMREAD_REDUCED_COLOR_2
+        except Exception:
+            pass
+        
+        image = cv2.imread(path, flags)
+        if image is None:
+            print(f"Failed to read image: {path}")
+            return None
+        
+        return self.process(image)
+    
+    def process_batch(self, images: List[ImageInput]) -> List[Optional[np.ndarray]]:
+        """
+        Process several face images with one FaceNet forward pass.
+        
+        Args:
+            images: Raw image bytes (JPEG) for each face
             
+        Returns:
+            List of 512-D float32 embeddings, None where no face was detected
+        """
+        results: List[Optional[np.ndarray]] = [None] * len(images)
+        try:
+            detected = []
+            for i, image_bytes in enumerate(images):
+                face_tensor = self.detect(image_bytes)
+                if face_tensor is not None:
+                    detected.append((i, face_tensor))
             
-            embedding = embedding.astype(np.float32)
-            embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
+            if detected:
+                embeddings = self.embed([t for _, t in detected])
+                for (i, _), embedding in zip(detected, embeddings):
+                    results[i] = embedding
             
-            return embedding
+            return results
             
         except Exception as e:
-            print(f"Face processing error: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+            _log_exception("Face batch processing error: %s", e)
+            return results
 
 
 class VoiceProcessor:
@@ -194,130 +927,381 @@ class VoiceProcessor:
     Falls back to MFCC if SpeechBrain fails.
     """
     
+    # Length of the pinned host staging buffer for GPU uploads (padded batch
+    # samples); larger batches are uploaded from pageable memory
+    PINNED_BUFFER_SECONDS = 30
+    
     def __init__(self, sample_rate: int = 16000):
         self.sample_rate = sample_rate
         self.encoder = None
         self._initialized = False
         self._use_fallback = False
+        self._pinned = None
+        self._pinned_lock = threading.Lock()
+        self._onnx_session = None
+        self._onnx_checked = False
+        # Guards loading/unloading of the encoder and the ONNX session
+        self._init_lock = threading.Lock()
+        # Concurrent process() calls share one ECAPA forward pass
+        self._encode_batcher = _MicroBatcher(
+            self._encode_batch,
+            config.ML_BATCH_MAX_SIZE,
+            config.ML_BATCH_WINDOW_MS,
+            "voice-embed-batcher"
+        )
     
     def _get_encoder(self):
-        """Lazy initialization of SpeechBrain speaker encoder."""
-        if not self._initialized:
+        """
+        Lazy initialization of SpeechBrain speaker encoder.
+        
+        Thread-safe: the startup warmup thread and request threads may race
+        here, and only one of them loads the model.
+        """
+        if self._initialized:
+            return self.encoder
+        with self._init_lock:
+            if not self._initialized:
+                self._load_encoder()
+            return self.encoder
+    
+    def _load_encoder(self):
+        """Load the SpeechBrain encoder (caller holds _init_lock)."""
+        try:
+            
+            import torch
+            import torchaudio
+            
+            
             try:
-                
-                import torch
-                import torchaudio
-                
-                
-                try:
-                    if hasattr(torchaudio, 'list_audio_backends'):
-                        backends = torchaudio.list_audio_backends()
-                        print(f"Available audio backends: {backends}")
-                except Exception:
-                    pass
-                
-                from speechbrain.inference import EncoderClassifier
-                
-                from speechbrain.utils.fetching import LocalStrategy
-                
-                
-                
+                if hasattr(torchaudio, 'list_audio_backends'):
+                    backends = torchaudio.list_audio_backends()
+                    print(f"Available audio backends: {backends}")
+            except Exception:
+                pass
+            
+            from speechbrain.inference import EncoderClassifier
+            
+            from speechbrain.utils.fetching import LocalStrategy
+            
+            
+            
+            with _file_lock(_SPEECHBRAIN_SAVEDIR + ".lock"):
+                savedir = _speechbrain_savedir()
                 self.encoder = EncoderClassifier.from_hparams(
-                    source="speechbrain/spkrec-ecapa-voxceleb",
-                    savedir="data/speechbrain_models/spkrec-ecapa-voxceleb",
+                    source=_SPEECHBRAIN_SOURCE,
+                    savedir=savedir,
                     run_opts={"device": "cuda" if torch.cuda.is_available() else "cpu"},
                     local_strategy=LocalStrategy.COPY
                 )
-                self._initialized = True
-                print(f"SpeechBrain ECAPA-TDNN model loaded (device: {'cuda' if torch.cuda.is_available() else 'cpu'})")
-            except ImportError as e:
+                if savedir == _SPEECHBRAIN_SAVEDIR:
+                    _speechbrain_savedir()  # mirror a fresh download to tmpfs
+            self._initialized = True
+            print(f"SpeechBrain ECAPA-TDNN model loaded (device: {'cuda' if torch.cuda.is_available() else 'cpu'})")
+        except ImportError as e:
+            
+            try:
+                import torch
+                from speechbrain.pretrained import EncoderClassifier
+                from speechbrain.utils.fetching import LocalStrategy
                 
-                try:
-                    import torch
-                    from speechbrain.pretrained import EncoderClassifier
-                    from speechbrain.utils.fetching import LocalStrategy
-                    
+                with _file_lock(_SPEECHBRAIN_SAVEDIR + ".lock"):
+                    savedir = _speechbrain_savedir()
                     self.encoder = EncoderClassifier.from_hparams(
-                        source="speechbrain/spkrec-ecapa-voxceleb",
-                        savedir="data/speechbrain_models/spkrec-ecapa-voxceleb",
+                        source=_SPEECHBRAIN_SOURCE,
+                        savedir=savedir,
                         run_opts={"device": "cuda" if torch.cuda.is_available() else "cpu"},
                         local_strategy=LocalStrategy.COPY
                     )
-                    self._initialized = True
-                    print("SpeechBrain loaded via pretrained import path")
-                except Exception as e2:
-                    print(f"Failed to initialize SpeechBrain: {e2}")
-                    self._use_fallback = True
-                    self._initialized = True
-            except Exception as e:
-                print(f"Failed to initialize SpeechBrain: {e}")
-                import traceback
-                traceback.print_exc()
+                    if savedir == _SPEECHBRAIN_SAVEDIR:
+                        _speechbrain_savedir()  # mirror a fresh download to tmpfs
+                self._initialized = True
+                print("SpeechBrain loaded via pretrained import path")
+            except Exception as e2:
+                print(f"Failed to initialize SpeechBrain: {e2}")
                 self._use_fallback = True
                 self._initialized = True
-        return self.encoder
+        except Exception as e:
+            _log_exception("Failed to initialize SpeechBrain: %s", e)
+            self._use_fallback = True
+            self._initialized = True
     
-    def process(self, audio_bytes: bytes) -> Optional[np.ndarray]:
+    def _get_onnx_session(self):
         """
-        Process voice audio and return 192-D speaker embedding.
+        Lazy ONNX Runtime session for the exported ECAPA embedding model.
         
-        Includes enhanced preprocessing for better accuracy:
-        - Audio normalization
-        - Noise reduction
-        - Voice activity detection (trimming silence)
-        - Minimum 3-second requirement for better embeddings
+        Returns None (and the SpeechBrain PyTorch model is used) when
+        onnxruntime is not installed or no export exists at VOICE_ONNX_PATH.
+        """
+        if self._onnx_checked:
+            return self._onnx_session
+        with self._init_lock:
+            if not self._onnx_checked:
+                providers = get_onnx_providers()
+                path = config.VOICE_ONNX_PATH
+                # Without CUDA prefer the INT8 model (VNNI int8 dot products)
+                if (
+                    'CUDAExecutionProvider' not in providers and
+                    os.path.isfile(config.VOICE_ONNX_INT8_PATH)
+                ):
+                    path = config.VOICE_ONNX_INT8_PATH
+                if ort is not None and os.path.isfile(path):
+                    try:
+                        self._onnx_session = ort.InferenceSession(
+                            path, sess_options=make_session_options(), providers=providers
+                        )
+                        print(f"ECAPA-TDNN ONNX model loaded: {path} ({self._onnx_session.get_providers()[0]})")
+                    except Exception as e:
+                        _log_exception("Failed to load ECAPA ONNX model: %s", e)
+                self._onnx_checked = True
+            return self._onnx_session
+    
+    def export_onnx(self, path: Optional[str] = None) -> str:
+        """
+        Export the ECAPA-TDNN embedding model to ONNX (one-time step).
+        
+        Only the embedding network is exported; filterbank features and
+        their normalization are still computed by SpeechBrain, so embeddings
+        match the PyTorch path.
         
         Args:
-            audio_bytes: Raw audio bytes (WAV/WebM format)
+            path: Output file (defaults to VOICE_ONNX_PATH)
             
         Returns:
-            192-D float32 embedding or None on error
+            Path of the written model
         """
-        try:
-            
-            audio_io = io.BytesIO(audio_bytes)
-            y, sr = librosa.load(audio_io, sr=self.sample_rate)
+        import torch
+        
+        path = path or config.VOICE_ONNX_PATH
+        encoder = self._get_encoder()
+        if encoder is None or self._use_fallback:
+            raise RuntimeError("SpeechBrain encoder is not available for export")
+        
+        model = encoder.mods.embedding_model
+        device = next(model.parameters()).device
+        feats = torch.randn(1, 300, 80, device=device)
+        lens = torch.ones(1, device=device)
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with torch.inference_mode():
+            torch.onnx.export(
+                model,
+                (feats, lens),
+                path,
+                input_names=['feats', 'lens'],
+                output_names=['embedding'],
+                dynamic_axes={'feats': {0: 'B', 1: 'T'}, 'lens': {0: 'B'}, 'embedding': {0: 'B'}},
+                opset_version=17
+            )
+        print(f"ECAPA-TDNN exported to {path}")
+        return path
+    
+    def quantize_onnx(
+        self,
+        calibration_audio: List[bytes],
+        path: Optional[str] = None
+    ) -> str:
+        """
+        Build an INT8 (QDQ) copy of the exported ECAPA model for CPU serving.
+        
+        Static quantization: activation ranges are calibrated on the
+        features of real recordings, which should resemble production audio
+        (a few hundred clips is enough). Compare genuine/impostor cosine
+        scores of both models on a held-out set before deploying.
+        
+        Args:
+            calibration_audio: Raw audio files (any format decode() reads)
+            path: Output file (defaults to VOICE_ONNX_INT8_PATH)
             
+        Returns:
+            Path of the written model
+        """
+        import torch
+        from onnxruntime.quantization import (
+            CalibrationDataReader, QuantFormat, QuantType, quantize_static
+        )
+        
+        path = path or config.VOICE_ONNX_INT8_PATH
+        if not os.path.isfile(config.VOICE_ONNX_PATH):
+            raise FileNotFoundError(f"Export the FP32 model first: {config.VOICE_ONNX_PATH}")
+        encoder = self._get_encoder()
+        if encoder is None or self._use_fallback:
+            raise RuntimeError("SpeechBrain encoder is not available for calibration")
+        
+        feeds = []
+        for audio in calibration_audio:
+            y = self.decode(audio)
             if len(y) == 0:
-                print("Empty audio")
-                return None
-            
-            
-            
-            
-            max_val = np.max(np.abs(y))
-            if max_val > 0:
-                y = y / max_val * 0.95  
-            
-            
-            y = y - np.mean(y)
-            
+                continue
+            wav = torch.from_numpy(np.ascontiguousarray(self.preprocess(y), dtype=np.float32))
+            wav = wav.unsqueeze(0).to(next(encoder.mods.parameters()).device)
+            lens = torch.ones(1, device=wav.device)
+            with torch.inference_mode():
+                feats = encoder.mods.mean_var_norm(encoder.mods.compute_features(wav), lens)
+            feeds.append({'feats': feats.float().cpu().numpy(), 'lens': lens.cpu().numpy()})
+        if not feeds:
+            raise ValueError("No usable calibration audio")
+        
+        class _Reader(CalibrationDataReader):
+            def __init__(self):
+                self._feeds = iter(feeds)
             
+            def get_next(self):
+                return next(self._feeds, None)
+        
+        quantize_static(
+            config.VOICE_ONNX_PATH,
+            path,
+            _Reader(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True
+        )
+        print(f"ECAPA-TDNN INT8 model written to {path} ({len(feeds)} calibration clips)")
+        return path
+    
+    def _decode_ffmpeg(self, audio_bytes: bytes) -> np.ndarray:
+        """
+        Decode audio by piping it through ffmpeg.
+        
+        ffmpeg reads the container from stdin and writes mono float32 PCM at
+        the target sample rate to stdout, so nothing touches disk.
+        """
+        result = subprocess.run(
+            [
+                'ffmpeg', '-v', 'quiet', '-nostdin',
+                '-i', 'pipe:0',
+                '-f', 'f32le', '-ac', '1', '-ar', str(self.sample_rate),
+                'pipe:1'
+            ],
+            input=audio_bytes,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True
+        )
+        return np.frombuffer(result.stdout, dtype=np.float32)
+    
+    def _decode_soundfile(self, audio_bytes: bytes) -> np.ndarray:
+        """
+        Decode WAV/FLAC/OGG in-process with libsndfile.
+        
+        Multi-channel audio is averaged to mono and other sample rates are
+        converted with torchaudio's windowed-sinc resampler.
+        """
+        data, sr = sf.read(io.BytesIO(audio_bytes), dtype='float32', always_2d=False)
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        
+        if sr != self.sample_rate:
+            import torch
+            import torchaudio.functional as AF
             
-            y_trimmed, _ = librosa.effects.trim(y, top_db=25)
+            data = AF.resample(
+                torch.from_numpy(np.ascontiguousarray(data)), sr, self.sample_rate
+            ).numpy()
+        return data
+    
+    def decode(self, audio_bytes: bytes) -> np.ndarray:
+        """
+        Decode audio bytes (WAV/WebM/MP3/...) to mono float32 at sample_rate.
+        
+        Formats libsndfile reads (WAV, FLAC, OGG) are decoded in-process;
+        anything else (browser WebM/Opus) goes through ffmpeg when it is
+        installed. librosa is the last resort.
+        """
+        try:
+            return self._decode_soundfile(audio_bytes)
+        except (RuntimeError, ValueError):
+            pass  # not a libsndfile format
+        
+        if _FFMPEG_PATH:
+            try:
+                return self._decode_ffmpeg(audio_bytes)
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"ffmpeg decode failed, falling back to librosa: {e}")
+        
+        y, _ = librosa.load(io.BytesIO(audio_bytes), sr=self.sample_rate)
+        return y
+    
+    def preprocess(self, y: np.ndarray) -> np.ndarray:
+        """
+        Condition a decoded waveform for the speaker encoder.
+        
+        Peak-normalizes, removes DC offset, trims silence, applies
+        pre-emphasis and repeats short clips up to the 3-second minimum.
+        
+        Args:
+            y: Non-empty mono float waveform at sample_rate
             
+        Returns:
+            Preprocessed waveform
+        """
+        max_val = np.max(np.abs(y))
+        if max_val > 0:
+            y = y / max_val * 0.95  
+        
+        
+        y = y - np.mean(y)
+        
+        
+        
+        y_trimmed, _ = librosa.effects.trim(y, top_db=25)
+        
+        
+        if len(y_trimmed) > self.sample_rate * 0.5:  
+            y = y_trimmed
+            print(f"Audio trimmed: {len(y)/self.sample_rate:.2f}s of speech detected")
+        
+        
+        pre_emphasis = 0.97
+        y = np.append(y[0], y[1:] - pre_emphasis * y[:-1])
+        
+        
+        min_duration = 3 * self.sample_rate
+        if len(y) < min_duration:
             
-            if len(y_trimmed) > self.sample_rate * 0.5:  
-                y = y_trimmed
-                print(f"Audio trimmed: {len(y)/self.sample_rate:.2f}s of speech detected")
+            repeats = int(np.ceil(min_duration / len(y)))
+            y = np.tile(y, repeats)[:min_duration]
+            print(f"Audio repeated to reach {min_duration/self.sample_rate:.1f}s minimum")
+        
+        
+        max_val = np.max(np.abs(y))
+        if max_val > 0:
+            y = y / max_val * 0.95
+        
+        return y
+    
+    def process(self, audio_bytes: bytes) -> Optional[np.ndarray]:
+        """
+        Process voice audio and return 192-D speaker embedding.
+        
+        Includes enhanced preprocessing for better accuracy:
+        - Audio normalization
+        - Noise reduction
+        - Voice activity detection (trimming silence)
+        - Minimum 3-second requirement for better embeddings
+        
+        Args:
+            audio_bytes: Raw audio bytes (WAV/WebM format)
             
+        Returns:
+            192-D float32 embedding or None on error
+        """
+        decoded = None
+        sr = self.sample_rate
+        try:
             
-            pre_emphasis = 0.97
-            y = np.append(y[0], y[1:] - pre_emphasis * y[:-1])
+            decoded = self.decode(audio_bytes)
+            y = decoded
             
+            if len(y) == 0:
+                print("Empty audio")
+                return None
             
-            min_duration = 3 * self.sample_rate
-            if len(y) < min_duration:
-                
-                repeats = int(np.ceil(min_duration / len(y)))
-                y = np.tile(y, repeats)[:min_duration]
-                print(f"Audio repeated to reach {min_duration/self.sample_rate:.1f}s minimum")
             
             
-            max_val = np.max(np.abs(y))
-            if max_val > 0:
-                y = y / max_val * 0.95
             
+            y = self.preprocess(y)
             
             encoder = self._get_encoder()
             
@@ -325,99 +1309,281 @@ class VoiceProcessor:
                 print("Using MFCC fallback for voice embedding")
                 return self._fallback_mfcc(y, sr)
             
-            import torch
-            
-            
-            device = next(encoder.mods.parameters()).device
-            
-            
-            audio_tensor = torch.tensor(y).unsqueeze(0).float().to(device)
-            
-            
-            with torch.no_grad():
-                embedding = encoder.encode_batch(audio_tensor)
-                embedding = embedding.squeeze().cpu().numpy()
+            embedding = self._encode(y)
             
             print(f"Voice embedding extracted, shape: {embedding.shape}")
             
             
-            embedding = embedding.astype(np.float32)
-            embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
-            
-            return embedding
+            return _normalize_f32(embedding)
             
         except Exception as e:
-            print(f"Voice processing error: {e}")
-            import traceback
-            traceback.print_exc()
+            _log_exception("Voice processing error: %s", e)
             
             try:
-                audio_io = io.BytesIO(audio_bytes)
-                y, sr = librosa.load(audio_io, sr=self.sample_rate)
-                return self._fallback_mfcc(y, sr)
+                # Reuse the decoded audio if decoding got that far
+                if decoded is None:
+                    decoded = self.decode(audio_bytes)
+                return self._fallback_mfcc(decoded, sr)
             except:
                 return None
     
+    def _encode(self, y: np.ndarray) -> np.ndarray:
+        """
+        Run ECAPA-TDNN on a preprocessed waveform.
+        
+        The waveform is queued on the shared micro-batcher, so concurrent
+        requests are encoded together by _encode_batch().
+        """
+        return self._encode_batcher.submit(y)
+    
+    def _encode_batch(self, waveforms: List[np.ndarray]) -> np.ndarray:
+        """
+        Encode several waveforms in one ECAPA-TDNN forward pass.
+        
+        Waveforms are right-padded with zeros to the longest one and the
+        relative lengths are passed as wav_lens, so feature normalization and
+        statistics pooling ignore the padding. On CUDA the padded batch is
+        staged through a reusable pinned host buffer so the host-to-device
+        copy is a direct asynchronous DMA.
+        
+        Args:
+            waveforms: Preprocessed 1-D float waveforms
+            
+        Returns:
+            (N, 192) float32 array of raw embeddings
+        """
+        import torch
+        
+        # Read through the lock-guarded accessor: unload() may run concurrently
+        encoder = self._get_encoder()
+        if encoder is None:
+            raise RuntimeError("SpeechBrain encoder is not available")
+        device = next(encoder.mods.parameters()).device
+        
+        lengths = [len(w) for w in waveforms]
+        t_max = max(lengths)
+        wav_lens = torch.tensor(lengths, dtype=torch.float32) / t_max
+        
+        def fill(batch):
+            for row, w, n in zip(batch, waveforms, lengths):
+                row[:n].copy_(torch.from_numpy(np.ascontiguousarray(w, dtype=np.float32)))
+                row[n:].zero_()
+            return batch
+        
+        session = self._get_onnx_session()
+        if session is not None:
+            batch = fill(torch.empty((len(waveforms), t_max), dtype=torch.float32))
+            return self._run_onnx(encoder, session, batch.to(device), wav_lens.to(device))
+        
+        capacity = self.PINNED_BUFFER_SECONDS * self.sample_rate
+        if device.type != 'cuda' or len(waveforms) * t_max > capacity:
+            batch = fill(torch.empty((len(waveforms), t_max), dtype=torch.float32))
+            return self._run_encoder(encoder, batch.to(device), wav_lens.to(device), device)
+        
+        # The buffer is reused, so it stays locked until the result is back
+        # on the host (which also guarantees the async copy has finished)
+        with self._pinned_lock:
+            if self._pinned is None:
+                self._pinned = torch.empty(capacity, dtype=torch.float32, pin_memory=True)
+            staged = fill(self._pinned[:len(waveforms) * t_max].view(len(waveforms), t_max))
+            audio_tensor = staged.to(device, non_blocking=True)
+            return self._run_encoder(encoder, audio_tensor, wav_lens.to(device), device)
+    
+    @staticmethod
+    def _run_encoder(encoder, audio_tensor, wav_lens, device) -> np.ndarray:
+        """Forward pass returning raw (N, 192) embeddings as a float32 array."""
+        import torch
+        
+        # FP16 autocast on CUDA runs the ECAPA convolutions on Tensor Cores.
+        # Audio and weights stay FP32: filterbank features (STFT) and
+        # BatchNorm statistics are kept at full precision by autocast.
+        use_fp16 = config.ML_HALF_PRECISION and device.type == 'cuda'
+        
+        with torch.inference_mode(), torch.autocast(
+            device_type=device.type, dtype=torch.float16, enabled=use_fp16
+        ):
+            embedding = encoder.encode_batch(audio_tensor, wav_lens)
+            return embedding.squeeze(1).float().cpu().numpy()
+    
+    @staticmethod
+    def _run_onnx(encoder, session, audio_tensor, wav_lens) -> np.ndarray:
+        """SpeechBrain features + ONNX Runtime embedding, (N, 192) float32."""
+        import torch
+        
+        with torch.inference_mode():
+            feats = encoder.mods.compute_features(audio_tensor)
+            feats = encoder.mods.mean_var_norm(feats, wav_lens)
+        
+        embedding, = session.run(None, {
+            'feats': feats.float().cpu().numpy(),
+            'lens': wav_lens.float().cpu().numpy()
+        })
+        return embedding.reshape(len(embedding), -1).astype(np.float32, copy=False)
+    
     def _fallback_mfcc(self, y: np.ndarray, sr: int) -> Optional[np.ndarray]:
         """Fallback MFCC embedding if SpeechBrain fails."""
         try:
             
             mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=40)
-            
-            
-            mfcc_mean = np.mean(mfccs, axis=1)
-            mfcc_std = np.std(mfccs, axis=1)
-            mfcc_delta = np.mean(librosa.feature.delta(mfccs), axis=1)
-            mfcc_delta2 = np.mean(librosa.feature.delta(mfccs, order=2), axis=1)
-            
-            
-            embedding = np.concatenate([mfcc_mean, mfcc_std, mfcc_delta, mfcc_delta2])
-            
-            
-            if len(embedding) < 192:
-                embedding = np.pad(embedding, (0, 192 - len(embedding)))
-            else:
-                embedding = embedding[:192]
-            
-            
-            embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
-            
-            return embedding.astype(np.float32)
+            n_mfcc, n_frames = mfccs.shape
+            if n_frames < _DELTA_WIDTH:
+                raise ValueError(f"Audio too short for delta features ({n_frames} frames)")
+            
+            # One prefix-sum pass gives the mean and every window sum the
+            # delta / delta-delta means need; one einsum gives the squares
+            prefix = np.zeros((n_mfcc, n_frames + 1), dtype=np.float64)
+            np.cumsum(mfccs, axis=1, out=prefix[:, 1:])
+            
+            mfcc_mean = prefix[:, -1] / n_frames
+            mean_sq = np.einsum('ij,ij->i', mfccs, mfccs, dtype=np.float64) / n_frames
+            mfcc_std = np.sqrt(np.maximum(mean_sq - mfcc_mean * mfcc_mean, 0.0))
+            
+            window_sums = (
+                prefix[:, n_frames - _DELTA_HALF + _DELTA_OFFSETS] -
+                prefix[:, _DELTA_HALF + _DELTA_OFFSETS]
+            )
+            head = mfccs[:, :_DELTA_WIDTH]
+            tail = mfccs[:, -_DELTA_WIDTH:]
+            
+            
+            # Layout: mean | std | delta | delta2 (40 each), zero-padded to 192
+            embedding = np.zeros(192, dtype=np.float32)
+            embedding[:n_mfcc] = mfcc_mean
+            embedding[n_mfcc:2 * n_mfcc] = mfcc_std
+            for i, (interior, edge) in enumerate(_DELTA_WEIGHTS, start=2):
+                embedding[i * n_mfcc:(i + 1) * n_mfcc] = (
+                    window_sums @ interior + head @ edge + tail @ edge
+                ) / n_frames
+            
+            
+            return _normalize_f32(embedding)
         except Exception as e:
             print(f"MFCC fallback error: {e}")
             return None
 
 
+_OCR_READER_LOCK = threading.Lock()
+
+# Runs document OCR alongside face detection/embedding in the calling thread;
+# OpenCV, torch and EasyOCR release the GIL in their native code. When every
+# slot is busy, OCR runs inline on the caller instead of queueing behind them.
+_OCR_POOL = ThreadPoolExecutor(
+    max_workers=max(1, config.DOC_OCR_WORKERS), thread_name_prefix="doc-ocr"
+)
+_OCR_SLOTS = threading.BoundedSemaphore(max(1, config.DOC_OCR_WORKERS))
+
+
+def _start_ocr(extract_text, image) -> Callable[[], str]:
+    """
+    Start OCR on the pool if a worker is free.
+    
+    Returns:
+        Callable returning the extracted text; with the pool saturated it
+        runs OCR on the calling thread when invoked
+    """
+    if not _OCR_SLOTS.acquire(blocking=False):
+        return lambda: extract_text(image)
+    
+    def run():
+        try:
+            return extract_text(image)
+        finally:
+            _OCR_SLOTS.release()
+    
+    return _OCR_POOL.submit(run).result
+
+
+@lru_cache(maxsize=1)
+def _load_ocr_reader():
+    """Build the EasyOCR reader; None if EasyOCR cannot be initialized."""
+    try:
+        import torch
+        import easyocr
+        
+        gpu = torch.cuda.is_available()
+        reader = easyocr.Reader(
+            ['en'],
+            gpu=gpu,
+            model_storage_directory="data/easyocr"
+        )
+        print(f"EasyOCR reader initialized (device: {'cuda' if gpu else 'cpu'})")
+        return reader
+    except Exception as e:
+        _log_exception("Failed to initialize EasyOCR: %s", e)
+        return None
+
+
+def _get_ocr_reader():
+    """
+    Process-wide EasyOCR reader shared by every DocumentProcessor.
+    
+    The CRAFT detector and recognizer weights are loaded once per process;
+    the lock keeps concurrent first calls (e.g. warmup and a request) from
+    both building one.
+    """
+    with _OCR_READER_LOCK:
+        return _load_ocr_reader()
+
+
 class DocumentProcessor:
     """
     Document processing using EasyOCR and ArcFace.
     Extracts text and face embedding for combined embedding.
     """
     
-    def __init__(self, output_dim: int = 512):
+    # Fixed random projection for text features (36 chars -> 128-D), built
+    # once per process. A private RandomState(43) reproduces the legacy
+    # np.random.seed(43) matrix exactly (so embeddings of already-registered
+    # documents stay comparable) without touching the global RNG.
+    _PROJECTION = np.random.RandomState(43).randn(36, 128).astype(np.float32)
+    
+    def __init__(
+        self,
+        output_dim: int = 512,
+        face_processor: Optional[FaceProcessor] = None,
+        extract_text_enabled: Optional[bool] = None
+    ):
+        """
+        Args:
+            output_dim: Face embedding dimension
+            face_processor: FaceProcessor to reuse; defaults to the ML engine's
+            extract_text_enabled: Run OCR; defaults to config.DOC_OCR_ENABLED.
+                When False no reader is ever loaded and extract_text returns "".
+        """
         self.output_dim = output_dim
-        
-        
-        import torch
-        self.reader = easyocr.Reader(['en'], gpu=torch.cuda.is_available())
-        
-        
-        self.face_processor = FaceProcessor()
-        
+        self._face_processor = face_processor
+        self.extract_text_enabled = (
+            config.DOC_OCR_ENABLED if extract_text_enabled is None else extract_text_enabled
+        )
         
         self.text_dim = 128
     
-    def extract_text(self, image_bytes: bytes) -> str:
-        """Extract text from document using OCR."""
+    @property
+    def face_processor(self) -> FaceProcessor:
+        """Face processor used for the document photo (shared FaceNet models)."""
+        if self._face_processor is None:
+            self._face_processor = get_ml_engine().face_processor
+        return self._face_processor
+    
+    def _get_reader(self):
+        """EasyOCR reader (process-wide singleton, loaded on first use)."""
+        return _get_ocr_reader()
+    
+    def extract_text(self, image: ImageInput) -> str:
+        """Extract text from document (raw bytes or decoded BGR array) using OCR."""
+        if not self.extract_text_enabled:
+            return ""
         
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        image = decode_image(image)
         
         if image is None:
             return ""
         
+        reader = self._get_reader()
+        if reader is None:
+            return ""
         
-        results = self.reader.readtext(image)
+        results = reader.readtext(image)
         
         
         text_parts = [result[1] for result in results]
@@ -431,28 +1597,24 @@ class DocumentProcessor:
             return np.zeros(self.text_dim, dtype=np.float32)
         
         
-        text_lower = text.lower()
-        char_freq = np.zeros(26 + 10, dtype=np.float32)  
+        # Histogram of a-z / 0-9 over the ASCII bytes (non-ASCII is dropped);
+        # compiled with numba when available, NumPy lookup table otherwise.
+        # Both fold A-Z themselves, so lower() is only needed for non-ASCII
+        # text, where it can produce ASCII letters (e.g. the Kelvin sign)
+        if not text.isascii():
+            text = text.lower()
+        codes = np.frombuffer(text.encode('ascii', 'ignore'), dtype=np.uint8)
+        char_freq = _char_hist(codes)
         
-        for char in text_lower:
-            if 'a' <= char <= 'z':
-                char_freq[ord(char) - ord('a')] += 1
-            elif '0' <= char <= '9':
-                char_freq[26 + int(char)] += 1
+        total = char_freq.sum()
+        if total > 0:
+            char_freq /= total
         
         
-        if char_freq.sum() > 0:
-            char_freq = char_freq / char_freq.sum()
+        embedding = char_freq @ DocumentProcessor._PROJECTION
         
         
-        np.random.seed(43)
-        projection = np.random.randn(36, self.text_dim).astype(np.float32)
-        embedding = np.dot(char_freq, projection)
-        
-        
-        embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
-        
-        return embedding.astype(np.float32)
+        return _normalize_f32(embedding)
     
     def preprocess_document_image(self, image: np.ndarray) -> np.ndarray:
         """
@@ -463,12 +1625,7 @@ class DocumentProcessor:
             return None
         
         # Convert to RGB if needed
-        if len(image.shape) == 2:
-            image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-        elif image.shape[2] == 4:
-            image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
-        elif image.shape[2] == 3:
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        image = _to_rgb(image)
         
         # Resize to reasonable dimensions for better face detection
         h, w = image.shape[:2]
@@ -477,7 +1634,8 @@ class DocumentProcessor:
             scale = target_size / max(h, w)
             new_w = int(w * scale)
             new_h = int(h * scale)
-            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LANCZOS4)
+            # Area averaging: the cheapest kernel that does not alias when shrinking
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
         elif min(h, w) < 200:
             scale = 200 / min(h, w)
             new_w = int(w * scale)
@@ -506,100 +1664,75 @@ class DocumentProcessor:
         
         return image
     
-    def extract_face_from_document(self, image_bytes: bytes) -> Optional[np.ndarray]:
+    def detect_document_face(self, image: ImageInput):
+        """
+        Enhanced face detection on ID documents with multiple attempts.
+        Uses progressively relaxed parameters to find faces in difficult images.
+        
+        Args:
+            image: Raw image bytes (JPEG) or an already-decoded BGR array
+        
+        Returns:
+            Aligned 3x160x160 face tensor or None if no face was found
+        """
+        from PIL import Image
+        
+        # Decode image (no-op if already decoded)
+        image = decode_image(image)
+        
+        if image is None:
+            print("Failed to decode document image")
+            return None
+        
+        # Apply document-specific preprocessing
+        image = self.preprocess_document_image(image)
+        if image is None:
+            return None
+        
+        print(f"Document image preprocessed: {image.shape}")
+        
+        # Get models
+        mtcnn, resnet = self.face_processor._get_models()
+        if mtcnn is None or resnet is None:
+            return None
+        
+        pil_image = Image.fromarray(image)
+        
+        # First attempt with standard detection
+        face_tensor = mtcnn(pil_image)
+        
+        # If no face found, retry with progressively more lenient settings
+        # (larger margin, smaller minimum face, lower thresholds)
+        if face_tensor is None:
+            for lenient_mtcnn in _FACE_MODELS.lenient_detectors():
+                print("Detection failed, retrying with relaxed thresholds...")
+                face_tensor = lenient_mtcnn(pil_image)
+                if face_tensor is not None:
+                    break
+        
+        if face_tensor is None:
+            print("No face detected in document after multiple attempts")
+            return None
+        
+        return face_tensor
+    
+    def extract_face_from_document(self, image: ImageInput) -> Optional[np.ndarray]:
         """
         Enhanced face extraction from ID documents with multiple attempts.
         Uses progressively relaxed parameters to find faces in difficult images.
         """
         try:
-            import torch
-            from PIL import Image
-            from facenet_pytorch import MTCNN, InceptionResnetV1
-            
-            # Decode image
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if image is None:
-                print("Failed to decode document image")
-                return None
-            
-            # Apply document-specific preprocessing
-            image = self.preprocess_document_image(image)
-            if image is None:
-                return None
-            
-            print(f"Document image preprocessed: {image.shape}")
-            
-            # Get models
-            mtcnn, resnet = self.face_processor._get_models()
-            if mtcnn is None or resnet is None:
-                return None
-            
-            device = self.face_processor._device
-            pil_image = Image.fromarray(image)
-            
-            # First attempt with standard detection
-            face_tensor = mtcnn(pil_image)
-            
-            # If no face found, try with more lenient settings
-            if face_tensor is None:
-                print("Standard detection failed, trying lenient thresholds...")
-                
-                # Create temporary MTCNN with relaxed thresholds
-                lenient_mtcnn = MTCNN(
-                    image_size=160,
-                    margin=40,  # Larger margin
-                    min_face_size=15,  # Smaller minimum face
-                    thresholds=[0.5, 0.6, 0.6],  # Lower thresholds
-                    factor=0.709,
-                    post_process=True,
-                    device=device,
-                    keep_all=False
-                )
-                face_tensor = lenient_mtcnn(pil_image)
-            
-            # If still no face, try even more relaxed settings
-            if face_tensor is None:
-                print("Lenient detection failed, trying very relaxed thresholds...")
-                
-                very_lenient_mtcnn = MTCNN(
-                    image_size=160,
-                    margin=60,  # Even larger margin
-                    min_face_size=10,  # Very small minimum
-                    thresholds=[0.4, 0.5, 0.5],  # Very low thresholds
-                    factor=0.709,
-                    post_process=True,
-                    device=device,
-                    keep_all=False
-                )
-                face_tensor = very_lenient_mtcnn(pil_image)
-            
+            face_tensor = self.detect_document_face(image)
             if face_tensor is None:
-                print("No face detected in document after multiple attempts")
                 return None
             
-            # Extract embedding
-            if face_tensor.dim() == 3:
-                face_tensor = face_tensor.unsqueeze(0)
-            face_tensor = face_tensor.to(device)
-            
-            with torch.no_grad():
-                embedding = resnet(face_tensor)
-                embedding = embedding.squeeze().cpu().numpy()
-            
+            embedding = self.face_processor.embed([face_tensor])[0]
             print(f"Document face detected! Embedding shape: {embedding.shape}")
             
-            # Normalize
-            embedding = embedding.astype(np.float32)
-            embedding = embedding / (np.linalg.norm(embedding) + 1e-8)
-            
             return embedding
             
         except Exception as e:
-            print(f"Document face extraction error: {e}")
-            import traceback
-            traceback.print_exc()
+            _log_exception("Document face extraction error: %s", e)
             return None
     
     def process(self, image_bytes: bytes) -> Tuple[Optional[np.ndarray], str]:
@@ -620,37 +1753,93 @@ class DocumentProcessor:
             Tuple of (embedding, extracted text)
         """
         
-        text = self.extract_text(image_bytes)
-        print(f"Extracted text from document: {text[:100]}..." if len(text) > 100 else f"Extracted text: {text}")
+        out = np.empty(self.output_dim + self.text_dim, dtype=np.float32)
+        text = self.process_into(image_bytes, out)
+        return out, text
+    
+    def process_into(self, image_bytes: bytes, out: np.ndarray) -> str:
+        """
+        Process document, writing the combined embedding into caller storage.
+        
+        Args:
+            image_bytes: Raw image bytes (JPEG)
+            out: Writable float32 array of length 640 (512 face + 128 text)
+            
+        Returns:
+            Extracted text
+        """
+        # Decode once; OCR and face detection both read the same array
+        image = decode_image(image_bytes)
+        if image is None:
+            self.combine_into(out, None, "")
+            return ""
+        
+        # OCR runs on the pool (or inline if it is saturated) while this
+        # thread extracts the document face
+        get_text = _start_ocr(self.extract_text, image)
         
         # Use enhanced document face extraction
-        face_embedding = self.extract_face_from_document(image_bytes)
+        face_embedding = self.extract_face_from_document(image)
         
-        # Text embedding (already normalized in text_to_embedding)
-        text_embedding = self.text_to_embedding(text)
+        text = get_text()
+        print(f"Extracted text from document: {text[:100]}..." if len(text) > 100 else f"Extracted text: {text}")
+        
+        self.combine_into(out, face_embedding, text)
+        return text
+    
+    def combine(self, face_embedding: Optional[np.ndarray], text: str) -> np.ndarray:
+        """
+        Build the 640-D document embedding from a face embedding and OCR text.
+        
+        Args:
+            face_embedding: 512-D document face embedding, or None if not found
+            text: Text extracted from the document
+            
+        Returns:
+            Combined float32 embedding (face portion first, then text)
+        """
+        out = np.empty(self.output_dim + self.text_dim, dtype=np.float32)
+        return self.combine_into(out, face_embedding, text)
+    
+    def combine_into(
+        self,
+        out: np.ndarray,
+        face_embedding: Optional[np.ndarray],
+        text: str
+    ) -> np.ndarray:
+        """
+        Write the combined document embedding into a preallocated buffer.
+        
+        Args:
+            out: Writable float32 array of length 640
+            face_embedding: 512-D document face embedding, or None if not found
+            text: Text extracted from the document
+            
+        Returns:
+            out
+        """
+        face_part = out[:self.output_dim]
         
         if face_embedding is not None:
             # IMPORTANT: Keep face embedding normalized separately
             # This preserves the face vector's magnitude for accurate cosine similarity
             # when comparing with live face during verification
-            face_normalized = face_embedding / (np.linalg.norm(face_embedding) + 1e-8)
-            
-            # Combine embeddings - face portion stays pre-normalized
-            combined = np.concatenate([face_normalized.astype(np.float32), text_embedding])
+            face_part[:] = face_embedding
+            _normalize_f32(face_part)
             print(f"Document face embedding extracted successfully")
         else:
             # No face detected - use zeros
-            combined = np.concatenate([
-                np.zeros(512, dtype=np.float32),
-                text_embedding
-            ])
+            face_part.fill(0.0)
             print(f"Warning: No face detected in document")
         
+        # Text embedding (already normalized in text_to_embedding)
+        out[self.output_dim:] = self.text_to_embedding(text)
+        
         # DON'T normalize the combined vector as a whole!
         # This would scale down the face portion and reduce accuracy.
         # Each component is already normalized individually.
         
-        return combined.astype(np.float32), text
+        return out
 
 
 class MLEngine:
@@ -659,11 +1848,11 @@ class MLEngine:
     def __init__(self):
         self.face_processor = FaceProcessor()
         self.voice_processor = VoiceProcessor()
-        self.document_processor = DocumentProcessor()
+        self.document_processor = DocumentProcessor(face_processor=self.face_processor)
     
-    def process_face(self, image_bytes: bytes) -> Optional[np.ndarray]:
-        """Process face image and return 512-D FaceNet embedding."""
-        return self.face_processor.process(image_bytes)
+    def process_face(self, image: ImageInput) -> Optional[np.ndarray]:
+        """Process face image (encoded bytes or BGR array) and return 512-D FaceNet embedding."""
+        return self.face_processor.process(image)
     
     def process_voice(self, audio_bytes: bytes) -> Optional[np.ndarray]:
         """Process voice audio and return 192-D speaker embedding."""
@@ -673,23 +1862,193 @@ class MLEngine:
         """Process document and return embedding + text."""
         return self.document_processor.process(image_bytes)
     
+    def warmup(self):
+        """
+        Load every model and run one synthetic inference through each.
+        
+        Moves CUDA context creation, weight loading and kernel selection off
+        the first user request. Safe to run in a background thread.
+        """
+        start = time.perf_counter()
+        print("ML warmup started...")
+        
+        try:
+            import torch
+            
+            # Face: detector pass on a blank frame, then one FaceNet forward
+            # (a blank frame has no face, so the embedder is fed directly)
+            blank = np.full((640, 640, 3), 127, dtype=np.uint8)
+            self.face_processor.detect(blank)
+            if self.face_processor.resnet is not None:
+                self.face_processor.embed([torch.zeros(3, 160, 160)])
+            
+            # Voice: 1 s of low-level noise as a 16-bit WAV through the full decode path
+            rng = np.random.RandomState(0)
+            samples = (rng.randn(self.voice_processor.sample_rate) * 300).astype(np.int16)
+            buffer = io.BytesIO()
+            with wave.open(buffer, 'wb') as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(self.voice_processor.sample_rate)
+                wav.writeframes(samples.tobytes())
+            self.voice_processor.process(buffer.getvalue())
+            
+            # Document: load EasyOCR and run it once; compile the text histogram
+            self.document_processor.extract_text(np.full((200, 400, 3), 255, dtype=np.uint8))
+            self.document_processor.text_to_embedding("Warmup 0123")
+            
+            print(f"ML warmup finished in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            _log_exception("ML warmup failed: %s", e)
+    
+    def unload(self):
+        """
+        Release all loaded models (FaceNet, ECAPA-TDNN, EasyOCR).
+        
+        Models are loaded again lazily on the next request.
+        """
+        voice = self.voice_processor
+        # Same lock as _get_encoder/_get_onnx_session; _initialized is cleared
+        # first so lock-free readers never see it set with encoder=None
+        with voice._init_lock:
+            voice._initialized = False
+            voice._onnx_checked = False
+            voice.encoder = None
+            voice._use_fallback = False
+            voice._onnx_session = None
+        with voice._pinned_lock:
+            voice._pinned = None
+        
+        with _OCR_READER_LOCK:
+            _load_ocr_reader.cache_clear()
+        
+        # Drops FaceNet, then runs gc and empties the CUDA cache
+        self.face_processor.unload()
+    
+    def process_face_and_document(
+        self,
+        face_bytes: bytes,
+        doc_bytes: bytes
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], str]:
+        """
+        Process a selfie and an ID document together.
+        
+        Both faces are detected separately, then embedded with a single
+        FaceNet forward pass instead of one pass per image.
+        
+        Args:
+            face_bytes: Raw selfie image bytes (JPEG)
+            doc_bytes: Raw document image bytes (JPEG)
+            
+        Returns:
+            Tuple of (512-D face embedding or None, 640-D document embedding, document text)
+        """
+        doc = self.document_processor
+        
+        # Decode the document once for both OCR and face detection; OCR runs
+        # on the pool while both faces are detected and embedded here
+        doc_image = decode_image(doc_bytes)
+        get_text = _start_ocr(doc.extract_text, doc_image) if doc_image is not None else None
+        
+        face_tensor = None
+        doc_face_tensor = None
+        try:
+            face_tensor = self.face_processor.detect(face_bytes)
+        except Exception as e:
+            _log_exception("Face processing error: %s", e)
+        try:
+            if doc_image is not None:
+                doc_face_tensor = doc.detect_document_face(doc_image)
+            else:
+                print("Failed to decode document image")
+        except Exception as e:
+            _log_exception("Document face extraction error: %s", e)
+        
+        tensors = [t for t in (face_tensor, doc_face_tensor) if t is not None]
+        embeddings = []
+        embed_failed = False
+        if tensors:
+            try:
+                embeddings = list(self.face_processor.embed(tensors))
+            except Exception as e:
+                _log_exception("Face embedding error: %s", e)
+                embed_failed = True
+        
+        text = get_text() if get_text is not None else ""
+        print(f"Extracted text from document: {text[:100]}..." if len(text) > 100 else f"Extracted text: {text}")
+        
+        if embed_failed:
+            return None, doc.combine(None, text), text
+        
+        face_embedding = embeddings.pop(0) if face_tensor is not None else None
+        doc_face_embedding = embeddings.pop(0) if doc_face_tensor is not None else None
+        
+        return face_embedding, doc.combine(doc_face_embedding, text), text
+    
     @staticmethod
     def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
-        """Compute cosine similarity between two vectors."""
+        """
+        Compute cosine similarity between two vectors.
         
+        Raises:
+            ValueError: If the vectors have different lengths
+        """
         if len(a) != len(b):
-            min_len = min(len(a), len(b))
-            a = a[:min_len]
-            b = b[:min_len]
+            raise ValueError(f"Embedding length mismatch: {len(a)} vs {len(b)}")
         
-        dot = np.dot(a, b)
-        norm_a = np.linalg.norm(a)
-        norm_b = np.linalg.norm(b)
-        
-        if norm_a == 0 or norm_b == 0:
+        # Three dot products, no temporaries (np.linalg.norm allocates)
+        norm_product = math.sqrt(float(a @ a) * float(b @ b))
+        if norm_product == 0:
             return 0.0
         
-        return float(dot / (norm_a * norm_b))
+        return float(a @ b) / norm_product
+    
+    @staticmethod
+    def cosine_similarity_unit(a: np.ndarray, b: np.ndarray) -> float:
+        """
+        Cosine similarity of two unit-norm vectors (a single dot product).
+        
+        Only for embeddings produced by this engine's face and voice
+        processors, which are L2-normalized; use cosine_similarity otherwise.
+        
+        Raises:
+            ValueError: If the vectors have different lengths
+        """
+        if len(a) != len(b):
+            raise ValueError(f"Embedding length mismatch: {len(a)} vs {len(b)}")
+        
+        return min(1.0, max(-1.0, float(a @ b)))
+    
+    @staticmethod
+    def cosine_similarity_batch(probe: np.ndarray, gallery: np.ndarray) -> np.ndarray:
+        """
+        Compute cosine similarity of one probe against many templates.
+        
+        The gallery is normalized row-wise and scored with a single
+        matrix-vector product instead of a Python loop of pairwise calls.
+        
+        Args:
+            probe: (D,) embedding
+            gallery: (N, D) embeddings
+            
+        Returns:
+            (N,) float32 similarity scores (0.0 for zero-norm rows)
+        """
+        probe = np.asarray(probe, dtype=np.float32)
+        gallery = np.asarray(gallery, dtype=np.float32)
+        if gallery.ndim != 2 or gallery.shape[1] != probe.shape[0]:
+            raise ValueError(
+                f"Embedding length mismatch: probe {probe.shape} vs gallery {gallery.shape}"
+            )
+        
+        probe_norm = math.sqrt(float(probe @ probe))
+        if probe_norm == 0:
+            return np.zeros(len(gallery), dtype=np.float32)
+        
+        gallery_norms = np.sqrt(np.einsum('ij,ij->i', gallery, gallery))
+        gallery_norms[gallery_norms == 0] = np.inf
+        
+        return (gallery @ (probe / probe_norm)) / gallery_norms
     
     @staticmethod
     def text_overlap(text1: str, text2: str) -> float:
@@ -699,18 +2058,36 @@ class MLEngine:
         if not text1 or not text2:
             return 0.0
         
-        # Tokenize (simple whitespace split)
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
+        # Tokenize with one compiled regex scan per text (punctuation is dropped)
+        words1 = _word_set(text1)
+        words2 = _word_set(text2)
         
         if not words1 or not words2:
             return 0.0
         
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
-        
-        return len(intersection) / len(union)
+        # |A ∪ B| = |A| + |B| - |A ∩ B|, so the union set is never built
+        intersection = len(words1 & words2)
+        return intersection / (len(words1) + len(words2) - intersection)
+
+
+# Global ML engine instance, created on first access so importing this
+# module loads no models (``from app.services.ml_engine import ml_engine``
+# still works through the module __getattr__ below)
+_ml_engine: Optional[MLEngine] = None
+_ml_engine_lock = threading.Lock()
+
+
+def get_ml_engine() -> MLEngine:
+    """Return the shared MLEngine, creating it on first call."""
+    global _ml_engine
+    if _ml_engine is None:
+        with _ml_engine_lock:
+            if _ml_engine is None:
+                _ml_engine = MLEngine()
+    return _ml_engine
 
 
-# Global ML engine instance
-ml_engine = MLEngine()
+def __getattr__(name: str):
+    if name == 'ml_engine':
+        return get_ml_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")